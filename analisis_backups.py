@@ -1,14 +1,38 @@
 import os
 import logging
-from collections import defaultdict, Counter
-from datetime import datetime
+from collections import defaultdict, Counter, OrderedDict
+from datetime import date, datetime, time, timedelta
+from bisect import bisect_left, bisect_right
+from array import array
+from math import isnan, nan
+from itertools import islice, chain
 from dateutil import parser
-from PIL import Image, ImageTk, ImageDraw, ImageFont
 import openpyxl
 from openpyxl.styles import PatternFill
-import ttkbootstrap as ttk
-from ttkbootstrap.constants import *
+from openpyxl.cell import WriteOnlyCell
 import sys
+import argparse
+import json
+from contextlib import contextmanager, redirect_stdout
+from time import perf_counter
+import cProfile
+import codecs
+import csv
+import gzip
+import io
+import zipfile
+import hashlib
+import marshal
+import sqlite3
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import queue
+import threading
+import asyncio
+import urllib.parse
+import urllib.request
 
 # --- Función para gestionar rutas de recursos (Esencial para PyInstaller) ---
 def obtener_ruta_recursos(relative_path):
@@ -26,167 +50,1942 @@ def obtener_ruta_recursos(relative_path):
 RUTA_INFORMES = "InformesSinProcesar"
 RUTA_EXPORTACION = "InformesExportados"
 CONFIGURACION_FECHA_HORA = '%Y-%m-%d %H:%M:%S'
+PROCESOS_INGESTA = None # Procesos para leer los informes en paralelo (None = todos los núcleos)
+RUTA_CACHE = "cache_informes.sqlite" # Caché de informes ya procesados (None para desactivarla)
+VIGILAR_INFORMES = True # Incorporar los informes nuevos mientras la aplicación está abierta
+INTERVALO_VIGILANCIA = 30 # Segundos entre revisiones de la carpeta de informes
+MAX_REINTENTOS_INFORME = 5 # Lecturas fallidas de un informe antes de esperar a que vuelva a cambiar
+RUTA_HISTORICO = "historico_informes" # Histórico de ejecuciones particionado por mes (None para leer siempre la carpeta completa)
+DIAS_CARGA_INICIAL = 14 # Días más recientes del histórico que se cargan al iniciar; el resto se lee al consultarlo
+RUTA_METRICAS = "metricas_ingesta.json" # Informe de tiempos por etapa y contadores por archivo (None para desactivarlo)
+MAX_AVISOS_POR_MOTIVO = 5 # Avisos por archivo y motivo que se registran en el log; los demás solo se cuentan
+CODIFICACION_CSV = "utf-8-sig" # Codificación de los informes CSV (p. ej. "cp1252" si el servidor los exporta así)
+CODIFICACIONES_ALTERNATIVAS_CSV = ("cp1252", "latin-1") # Si una línea no es CODIFICACION_CSV; latin-1 acepta cualquier byte
+
+# Definición de encabezados esperados y sus posibles aliases
+ENCABEZADOS_POSIBLES = {
+    'object name': ['object name', 'servidor', 'server', 'name', 'hostname'], # Añadido 'hostname'
+    'job name': ['job name', 'nombre del job', 'job', 'jobname'], # Añadido 'jobname'
+    'start time': ['start time', 'hora de inicio', 'start'],
+    'finish time': ['finish time', 'hora de fin', 'finish'],
+    'duration': ['duration', 'duración'],
+    'data read, gb': ['data read, gb', 'datos leídos', 'data read'],
+    'actual total backup size, gb': ['actual total backup size, gb', 'tamaño backup', 'backup size'],
+    'backup status': ['backup status', 'estado', 'status']
+}
+
+# Firma de la tabla de aliases: si cambia, los informes guardados en caché se vuelven a procesar
+VERSION_CACHE = 5 # Subir al cambiar la forma de interpretar las filas o de guardarlas
+FIRMA_ENCABEZADOS = hashlib.sha256(repr((VERSION_CACHE, list(ENCABEZADOS_POSIBLES.items()))).encode('utf-8')).hexdigest()
 
 # --- Logging (para registro de eventos y errores) ---
 logging.basicConfig(filename='log_analisis_backups_app.txt', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def buscar_encabezados(sheet):
-    # Definición de encabezados esperados y sus posibles aliases
-    posibles = {
-        'object name': ['object name', 'servidor', 'server', 'name', 'hostname'], # Añadido 'hostname'
-        'job name': ['job name', 'nombre del job', 'job', 'jobname'], # Añadido 'jobname'
-        'start time': ['start time', 'hora de inicio', 'start'],
-        'finish time': ['finish time', 'hora de fin', 'finish'],
-        'duration': ['duration', 'duración'],
-        'data read, gb': ['data read, gb', 'datos leídos', 'data read'],
-        'actual total backup size, gb': ['actual total backup size, gb', 'tamaño backup', 'backup size'],
-        'backup status': ['backup status', 'estado', 'status']
-    }
+# --- Métricas de ingesta y perfilado ---
+class MetricasIngesta:
+    """
+    Tiempos acumulados por etapa (abrir el libro, buscar encabezados, leer filas, clasificar fallas,
+    exportar...) y contadores por archivo (filas leídas, descartadas por motivo y fechas resueltas por
+    cada vía). Los procesos de trabajo devuelven las métricas de cada archivo junto con sus datos y se
+    acumulan aquí, en el proceso principal. Se puede usar desde varios hilos (interfaz y vigilante).
+    """
+
+    def __init__(self, ruta=RUTA_METRICAS):
+        self.ruta = ruta # Destino del informe JSON (None para no guardarlo)
+        self.bloqueo = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.bloqueo:
+            self.etapas = defaultdict(lambda: {'segundos': 0.0, 'veces': 0})
+            self.archivos = {}
+
+    def sumar_etapa(self, nombre, segundos, veces=1):
+        with self.bloqueo:
+            etapa = self.etapas[nombre]
+            etapa['segundos'] += segundos
+            etapa['veces'] += veces
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar_etapa(nombre, perf_counter() - inicio)
+
+    def registrar_archivo(self, archivo, metricas):
+        """Guarda las métricas de un archivo y suma sus tiempos a los de cada etapa."""
+        for nombre, segundos in metricas.get('segundos', {}).items():
+            self.sumar_etapa(nombre, segundos)
+        with self.bloqueo:
+            self.archivos[archivo] = metricas
+
+    def anotar_archivo(self, archivo, clave, valor):
+        """Añade un dato a las métricas de un archivo (p. ej. las ejecuciones duplicadas que aportó)."""
+        with self.bloqueo:
+            self.archivos.setdefault(archivo, {})[clave] = valor
+
+    def informe(self):
+        """Diccionario con las etapas, los totales de todos los archivos y el detalle por archivo."""
+        with self.bloqueo:
+            totales = Counter()
+            for metricas in self.archivos.values():
+                totales.update(metricas.get('filas', {}))
+                totales.update({f"fechas_{via}": n for via, n in metricas.get('fechas', {}).items()})
+                totales[f"archivos_{metricas.get('origen')}"] += 1
+                totales['duplicados'] += metricas.get('duplicados', 0)
+            return {'generado': datetime.now().isoformat(timespec='seconds'),
+                    'etapas': {nombre: {'segundos': round(etapa['segundos'], 4), 'veces': etapa['veces']}
+                               for nombre, etapa in self.etapas.items()},
+                    'totales': dict(totales),
+                    'archivos': dict(self.archivos)}
+
+    def guardar(self, ruta=None):
+        """Escribe el informe en JSON. Devuelve la ruta, o None si no se pudo (o no se pidió) guardar."""
+        ruta = ruta or self.ruta
+        if not ruta:
+            return None
+        try:
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(self.informe(), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.error(f"No se pudo guardar el informe de métricas en {ruta}: {e}")
+            return None
+        return ruta
+
+
+METRICAS = MetricasIngesta()
+
+
+class AvisosMuestreados:
+    """
+    Limita los avisos repetidos de un archivo: se registran los primeros 'maximo' de cada motivo y del
+    resto solo se lleva la cuenta, que se resume al final en una línea por motivo.
+    Así un informe con miles de filas defectuosas no dedica más tiempo al log que a leer las filas.
+    """
+
+    def __init__(self, archivo, maximo=MAX_AVISOS_POR_MOTIVO):
+        self.archivo = archivo
+        self.maximo = maximo
+        self.cuentas = Counter()
+
+    def permitir(self, motivo):
+        """Cuenta una aparición del motivo y dice si todavía hay que registrar el aviso."""
+        self.cuentas[motivo] += 1
+        return self.cuentas[motivo] <= self.maximo
+
+    def resumir(self):
+        """Registra cuántos avisos se omitieron por cada motivo y devuelve el total omitido."""
+        omitidos = 0
+        for motivo, cantidad in self.cuentas.items():
+            if cantidad > self.maximo:
+                omitidos += cantidad - self.maximo
+                logging.warning(f"{self.archivo}: se omitieron {cantidad - self.maximo} avisos más de '{motivo}' ({cantidad} en total).")
+        return omitidos
+
+
+@contextmanager
+def perfilar(ruta):
+    """
+    Si se indica una ruta, ejecuta el bloque bajo cProfile y guarda las estadísticas en ella
+    (se pueden abrir con pstats o snakeviz). Solo perfila el proceso principal: para ver también la
+    lectura de los informes, conviene usar un solo proceso de ingesta.
+    """
+    if not ruta:
+        yield
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(ruta)
+        logging.info(f"Perfil de ejecución guardado en {ruta}")
+
+
+def buscar_encabezados(filas):
+    """
+    Busca la fila de encabezados entre las primeras 20 filas de un iterador de filas (tuplas de valores).
+    Solo consume el iterador hasta la fila de encabezados, así que quien llama puede seguir leyendo
+    los datos del mismo iterador sin cargar la hoja completa en memoria.
+    """
 
     # Búsqueda en las primeras 20 filas para encontrar la fila de encabezados
-    for row_idx in range(1, 21):
-        row = sheet[row_idx]
+    for row_idx, row in enumerate(islice(filas, 20), start=1):
         encabezados_encontrados = {}
-        for col_idx, cell in enumerate(row):
-            valor = str(cell.value).strip().lower() if cell.value else ""
-            for clave_esperada, aliases in posibles.items():
+        for col_idx, celda in enumerate(row):
+            valor = str(celda).strip().lower() if celda else ""
+            for clave_esperada, aliases in ENCABEZADOS_POSIBLES.items():
                 # Importante: solo añadir si aún no se ha encontrado esa clave esperada
                 if valor in aliases and clave_esperada not in encabezados_encontrados:
                     encabezados_encontrados[clave_esperada] = col_idx # Almacena el índice de la columna
                     break # Una vez que encontramos un alias para esta celda, pasamos a la siguiente celda
 
         # Si se encontraron todos los encabezados requeridos, se devuelve el diccionario y la fila de inicio de datos
-        if len(encabezados_encontrados) == len(posibles):
+        if len(encabezados_encontrados) == len(ENCABEZADOS_POSIBLES):
             return encabezados_encontrados, row_idx + 1 # row_idx + 1 es la siguiente fila después de los encabezados
 
     return None, None # Si no se encuentran todos los encabezados en las primeras 20 filas
 
 
-def filtrar_fallos_reales(backups_por_servidor):
-    filtrados = defaultdict(list)
-    agrupados = defaultdict(list)
-    for servidor, historial in backups_por_servidor.items():
-        for b in historial:
-            clave = (servidor, b['nombre_trabajo'], b['inicio'].date())
-            agrupados[clave].append(b)
+# --- Almacén columnar de ejecuciones ---
+EPOCA = datetime(1970, 1, 1)
+SEGUNDOS_DIA = 86400
+# Campos que expone cada VistaIntento y columnas internas del RegistroBackups
+CAMPOS_INTENTO = ('servidor', 'nombre_trabajo', 'inicio', 'fin', 'duracion', 'data_read', 'tamano_backup', 'estado')
+COLUMNAS_REGISTRO = ('servidor', 'trabajo', 'estado', 'inicio', 'fin', 'duracion', 'data_read', 'tamano_backup')
 
-    for clave, ejecuciones in agrupados.items():
-        # Si NO hay NINGUNA ejecución exitosa para esa clave (servidor, trabajo, día),
-        # entonces consideramos todas las ejecuciones de esa clave como una "falla real"
-        if not any(e['estado'] == 'success' for e in ejecuciones):
-            for e in ejecuciones:
-                filtrados[clave[0]].append(e)
-    return filtrados
 
+def a_epoca(fecha):
+    """Segundos desde 1970 (hora local del informe, sin zona horaria) de un datetime."""
+    if fecha.tzinfo is not None:
+        fecha = fecha.replace(tzinfo=None)
+    return int((fecha - EPOCA).total_seconds())
 
-def analizar_informes(ruta_informes):
-    backups_por_servidor = defaultdict(list)
-    trabajos_por_servidor = defaultdict(set)
-    fechas_por_servidor_y_trabajo = defaultdict(set)
-    trabajos = set()
-    servidores = set()
-    fechas = set()
 
-    archivos = [os.path.join(ruta_informes, f) for f in os.listdir(ruta_informes) if f.endswith('.xlsx')]
-    if not archivos:
-        logging.warning(f"No hay archivos XLSX en la carpeta de informes: {ruta_informes}")
-        return backups_por_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo
+def desde_epoca(segundos):
+    return EPOCA + timedelta(seconds=segundos)
+
+
+def a_numero(valor):
+    """Convierte un tamaño (GB) a float; NaN si la celda está vacía o no es numérica."""
+    if valor is None or isinstance(valor, bool):
+        return nan
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        return float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return nan
+
+
+def a_segundos(valor):
+    """Convierte una duración (timedelta, time, número o texto 'H:MM:SS' / 'D.HH:MM:SS') a segundos."""
+    if valor is None or isinstance(valor, bool):
+        return nan
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    if isinstance(valor, time):
+        return valor.hour * 3600 + valor.minute * 60 + valor.second + valor.microsecond / 1e6
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip()
+    try:
+        dias = 0
+        if '.' in texto.split(':')[0]:
+            dias, texto = texto.split('.', 1)
+        partes = [float(p) for p in texto.split(':')]
+        while len(partes) < 3:
+            partes.insert(0, 0.0)
+        return int(dias) * SEGUNDOS_DIA + partes[0] * 3600 + partes[1] * 60 + partes[2]
+    except ValueError:
+        return nan
+
+
+class TablaCodigos:
+    """Internado de textos repetidos (servidores, trabajos, estados): cada valor distinto se guarda una vez."""
+
+    def __init__(self, valores=()):
+        self.valores = []
+        self.codigos = {}
+        for valor in valores:
+            self.codigo(valor)
+
+    def codigo(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class VistaIntento:
+    """
+    Vista de solo lectura de una fila del RegistroBackups.
+    Se accede como a un diccionario (intento['inicio'], intento['servidor'], ...) sin copiar la fila.
+    """
+    __slots__ = ('registro', 'indice')
+
+    def __init__(self, registro, indice):
+        self.registro = registro
+        self.indice = indice
+
+    def __getitem__(self, campo):
+        return self.registro.valor(self.indice, campo)
 
-    for archivo in archivos:
+    def get(self, campo, defecto=None):
         try:
-            workbook = openpyxl.load_workbook(archivo, data_only=True)
-            sheet = workbook.active
-            headers, fila_inicio = buscar_encabezados(sheet)
-            if not headers:
-                logging.error(f"No se encontraron todos los encabezados válidos en {archivo}. Se saltará este archivo.")
+            return self[campo]
+        except KeyError:
+            return defecto
+
+    def keys(self):
+        return CAMPOS_INTENTO
+
+    def __repr__(self):
+        return f"VistaIntento({dict((c, self[c]) for c in CAMPOS_INTENTO)})"
+
+
+
+class RegistroBackups:
+    """
+    Almacén columnar de ejecuciones de backup.
+    Servidor, trabajo y estado se guardan como códigos enteros internados; inicio y fin como segundos
+    desde 1970 (int64); duración (segundos), datos leídos y tamaño (GB) como float, con NaN si faltan.
+    Las filas se leen con VistaIntento, que no crea un diccionario por fila.
+    """
+
+    def __init__(self):
+        self.servidores = TablaCodigos()
+        self.trabajos = TablaCodigos()
+        self.estados = TablaCodigos()
+        self.servidor = array('i')
+        self.trabajo = array('i')
+        self.estado = array('i')
+        self.inicio = array('q')
+        self.fin = array('q')
+        self.duracion = array('d')
+        self.data_read = array('d')
+        self.tamano_backup = array('d')
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def __getitem__(self, indice):
+        return VistaIntento(self, indice)
+
+    def __iter__(self):
+        for indice in range(len(self)):
+            yield VistaIntento(self, indice)
+
+    def agregar(self, servidor, trabajo, inicio, fin, duracion, data_read, tamano_backup, estado):
+        self.servidor.append(self.servidores.codigo(servidor))
+        self.trabajo.append(self.trabajos.codigo(trabajo))
+        self.estado.append(self.estados.codigo(estado))
+        self.inicio.append(a_epoca(inicio))
+        self.fin.append(a_epoca(fin))
+        self.duracion.append(a_segundos(duracion))
+        self.data_read.append(a_numero(data_read))
+        self.tamano_backup.append(a_numero(tamano_backup))
+
+    def valor(self, indice, campo):
+        if campo == 'servidor':
+            return self.servidores.valores[self.servidor[indice]]
+        if campo == 'nombre_trabajo':
+            return self.trabajos.valores[self.trabajo[indice]]
+        if campo == 'estado':
+            return self.estados.valores[self.estado[indice]]
+        if campo == 'inicio':
+            return desde_epoca(self.inicio[indice])
+        if campo == 'fin':
+            return desde_epoca(self.fin[indice])
+        if campo in ('duracion', 'data_read', 'tamano_backup'):
+            numero = getattr(self, campo)[indice]
+            return None if isnan(numero) else numero
+        raise KeyError(campo)
+
+    def extender(self, otro):
+        """Añade todas las filas de otro registro, traduciendo sus códigos a los de este."""
+        mapa_servidor = [self.servidores.codigo(v) for v in otro.servidores.valores]
+        mapa_trabajo = [self.trabajos.codigo(v) for v in otro.trabajos.valores]
+        mapa_estado = [self.estados.codigo(v) for v in otro.estados.valores]
+        self.servidor.extend(array('i', (mapa_servidor[c] for c in otro.servidor)))
+        self.trabajo.extend(array('i', (mapa_trabajo[c] for c in otro.trabajo)))
+        self.estado.extend(array('i', (mapa_estado[c] for c in otro.estado)))
+        for columna in ('inicio', 'fin', 'duracion', 'data_read', 'tamano_backup'):
+            getattr(self, columna).extend(getattr(otro, columna))
+
+    def agregar_fila(self, otro, indice, mapa_servidor, mapa_trabajo, mapa_estado):
+        """Copia una fila de otro registro, traduciendo sus códigos con los mapas dados."""
+        self.servidor.append(mapa_servidor[otro.servidor[indice]])
+        self.trabajo.append(mapa_trabajo[otro.trabajo[indice]])
+        self.estado.append(mapa_estado[otro.estado[indice]])
+        for columna in ('inicio', 'fin', 'duracion', 'data_read', 'tamano_backup'):
+            getattr(self, columna).append(getattr(otro, columna)[indice])
+
+    def subconjunto(self, indices):
+        """Nuevo registro con las filas indicadas (en ese orden); comparte las tablas de códigos."""
+        nuevo = RegistroBackups()
+        nuevo.servidores, nuevo.trabajos, nuevo.estados = self.servidores, self.trabajos, self.estados
+        for columna in COLUMNAS_REGISTRO:
+            origen = getattr(self, columna)
+            setattr(nuevo, columna, array(origen.typecode, (origen[i] for i in indices)))
+        return nuevo
+
+    def ordenado(self):
+        """Copia ordenada por servidor, inicio, trabajo, fin y estado (por texto, no por código)."""
+        servidores, trabajos, estados = self.servidores.valores, self.trabajos.valores, self.estados.valores
+        orden = sorted(range(len(self)), key=lambda i: (servidores[self.servidor[i]], self.inicio[i],
+                                                         trabajos[self.trabajo[i]], self.fin[i], estados[self.estado[i]]))
+        return self.subconjunto(orden)
+
+    def serializar(self):
+        """Forma compacta y solo con tipos básicos, para la caché y para devolver datos desde los procesos."""
+        return (self.servidores.valores, self.trabajos.valores, self.estados.valores,
+                tuple(getattr(self, columna).tobytes() for columna in COLUMNAS_REGISTRO))
+
+    @classmethod
+    def deserializar(cls, datos):
+        servidores, trabajos, estados, columnas = datos
+        registro = cls()
+        registro.servidores = TablaCodigos(servidores)
+        registro.trabajos = TablaCodigos(trabajos)
+        registro.estados = TablaCodigos(estados)
+        for columna, contenido in zip(COLUMNAS_REGISTRO, columnas):
+            destino = array(getattr(registro, columna).typecode)
+            destino.frombytes(contenido)
+            setattr(registro, columna, destino)
+        return registro
+
+
+
+# Prioridad de los estados cuando una misma ejecución aparece en varios informes (gana la mayor)
+PRIORIDAD_ESTADOS = {'success': 3, 'warning': 2, 'failed': 1}
+DESPLAZAMIENTO_FIN = 1 << 40 # Con él, el fin (segundos, quizá negativos) ocupa 41 bits y la prioridad va por encima
+
+
+def rango_ejecucion(prioridad, fin):
+    """(prioridad del estado, fin) empaquetados en un entero que se compara igual que la tupla."""
+    return prioridad << 41 | (fin + DESPLAZAMIENTO_FIN)
+
+
+def huella_copia(duracion, data_read, tamano_backup):
+    """Desempate entre copias con igual estado y fin: sale solo de sus demás columnas, no del orden de llegada."""
+    return zlib.crc32(struct.pack('<3d', duracion, data_read, tamano_backup))
+
+
+def ejecuciones_unicas(registro):
+    """
+    Índices de una sola copia de cada ejecución (servidor, trabajo, inicio), ordenados por inicio.
+    Gana la misma copia que en ClasificadorFallos: mayor prioridad de estado, luego fin más tardío, luego mayor huella_copia.
+    """
+    prioridad_estado = [PRIORIDAD_ESTADOS.get(v, 0) for v in registro.estados.valores]
+    elegidas = {}
+    for i, (servidor, trabajo, inicio, fin, estado, duracion, data_read, tamano) in enumerate(zip(
+            registro.servidor, registro.trabajo, registro.inicio, registro.fin, registro.estado,
+            registro.duracion, registro.data_read, registro.tamano_backup)):
+        clave = (servidor, trabajo, inicio)
+        rango = (prioridad_estado[estado], fin, huella_copia(duracion, data_read, tamano))
+        actual = elegidas.get(clave)
+        if actual is None or rango > actual[0]:
+            elegidas[clave] = (rango, i)
+    return sorted((i for _, i in elegidas.values()), key=lambda i: (registro.inicio[i], i))
+
+
+class ClasificadorFallos:
+    """
+    Clasificación incremental de "fallas reales" a medida que llegan los informes.
+    Una clave (servidor, trabajo, día) queda resuelta en cuanto aparece una ejecución exitosa; mientras no
+    lo esté, sus intentos fallidos se guardan en 'fallas'. Así solo se conservan los intentos de claves sin
+    resolver y añadir un informe nuevo no obliga a reprocesar el historial.
+    También lleva los días vistos por (servidor, trabajo), de los que salen los catálogos de los filtros.
+    Como los informes diarios se solapan, cada ejecución (servidor, trabajo, inicio) se guarda una sola vez:
+    si vuelve a aparecer, gana la copia con el estado de mayor prioridad (PRIORIDAD_ESTADOS) y, a igual
+    estado, la de fin más tardío; si también coincide, la de mayor huella_copia, para que la copia que queda no
+    dependa del orden de los informes. 'duplicados' cuenta, por archivo, cuántas ejecuciones repetidas aportó cada uno.
+    """
+
+    def __init__(self):
+        self.fallas = RegistroBackups()
+        self.resueltas = set() # Claves (código servidor, código trabajo, día) con alguna ejecución exitosa
+        self.pendientes = defaultdict(list) # Clave sin resolver -> filas de 'fallas'
+        self.descartadas = 0 # Filas de 'fallas' cuya clave se resolvió después (se liberan al compactar)
+        self.dias_por_clave = defaultdict(set) # (código servidor, código trabajo) -> días con ejecuciones
+        # (código servidor, código trabajo) -> (inicios ordenados, rangos, huellas): una ejecución ocupa 20 bytes en arrays
+        # tipados (rango y huella_copia de la copia vigente, ver rango_ejecucion), no una tupla por clave y otra por valor
+        self.ejecuciones = {}
+        self.duplicados = Counter() # Archivo -> ejecuciones repetidas que aportó
+
+    def agregar(self, parcial, archivo=None):
+        """Incorpora las ejecuciones de un RegistroBackups (normalmente, las de un informe)."""
+        inicio_etapa = perf_counter()
+        fallas = self.fallas
+        mapa_servidor = [fallas.servidores.codigo(v) for v in parcial.servidores.valores]
+        mapa_trabajo = [fallas.trabajos.codigo(v) for v in parcial.trabajos.valores]
+        mapa_estado = [fallas.estados.codigo(v) for v in parcial.estados.valores]
+        prioridad_estado = [PRIORIDAD_ESTADOS.get(v, 0) for v in parcial.estados.valores]
+        codigo_exito = parcial.estados.codigos.get('success')
+
+        claves = [(mapa_servidor[servidor], mapa_trabajo[trabajo], inicio // SEGUNDOS_DIA)
+                  for servidor, trabajo, inicio in zip(parcial.servidor, parcial.trabajo, parcial.inicio)]
+
+        # Una sola copia por ejecución: 'elegidas' son las filas de este informe que quedan (clave de ejecución -> fila)
+        elegidas = {}
+        duplicados = 0
+        ejecuciones = self.ejecuciones
+        for i, (clave, inicio, fin, estado, duracion, data_read, tamano) in enumerate(zip(
+                claves, parcial.inicio, parcial.fin, parcial.estado, parcial.duracion, parcial.data_read, parcial.tamano_backup)):
+            par = clave[:2]
+            inicios, rangos, huellas = ejecuciones.get(par) or ejecuciones.setdefault(par, (array('q'), array('q'), array('I')))
+            rango = rango_ejecucion(prioridad_estado[estado], fin)
+            huella = huella_copia(duracion, data_read, tamano)
+            clave_ejecucion = (clave[0], clave[1], inicio)
+            # Los informes suelen llegar en orden, así que casi siempre la posición es el final (un append)
+            posicion = bisect_left(inicios, inicio)
+            if posicion < len(inicios) and inicios[posicion] == inicio:
+                duplicados += 1
+                if (rango, huella) <= (rangos[posicion], huellas[posicion]):
+                    continue
+                if clave_ejecucion not in elegidas: # La copia anterior venía de otro informe
+                    self.descartar_ejecucion(clave, inicio)
+                rangos[posicion] = rango
+                huellas[posicion] = huella
+            else:
+                inicios.insert(posicion, inicio)
+                rangos.insert(posicion, rango)
+                huellas.insert(posicion, huella)
+            elegidas[clave_ejecucion] = i
+        filas = sorted(elegidas.values())
+        if duplicados:
+            self.duplicados[archivo] += duplicados
+            logging.info(f"{archivo or 'Registro'}: {duplicados} ejecuciones repetidas de informes anteriores o del mismo informe.")
+        if archivo:
+            METRICAS.anotar_archivo(archivo, 'duplicados', self.duplicados[archivo])
+
+        # Primero los éxitos, para que el resultado no dependa del orden de las filas
+        for i in filas:
+            clave = claves[i]
+            self.dias_por_clave[clave[:2]].add(clave[2])
+            if parcial.estado[i] == codigo_exito and clave not in self.resueltas:
+                self.resueltas.add(clave)
+                self.descartadas += len(self.pendientes.pop(clave, ()))
+
+        for i in filas:
+            clave = claves[i]
+            if parcial.estado[i] == codigo_exito or clave in self.resueltas:
                 continue
+            self.pendientes[clave].append(len(fallas))
+            fallas.agregar_fila(parcial, i, mapa_servidor, mapa_trabajo, mapa_estado)
+
+        if self.descartadas > len(fallas) // 2:
+            self.compactar()
+        METRICAS.sumar_etapa('clasificacion', perf_counter() - inicio_etapa)
+        return self
+
+    def agregar_dias(self, claves):
+        """Añade a los catálogos días con ejecuciones sin cargar sus filas (meses del histórico aún no leídos)."""
+        for servidor, trabajo, dias in claves:
+            clave = (self.fallas.servidores.codigo(servidor), self.fallas.trabajos.codigo(trabajo))
+            self.dias_por_clave[clave].update(dias)
+
+    def descartar_ejecucion(self, clave, inicio):
+        """Quita de las fallas pendientes la copia de una ejecución que fue sustituida por otra."""
+        indices = self.pendientes.get(clave)
+        if not indices:
+            return # La clave ya estaba resuelta (o la copia anterior era un éxito)
+        for n, i in enumerate(indices):
+            if self.fallas.inicio[i] == inicio:
+                del indices[n]
+                self.descartadas += 1
+                break
+        if not indices:
+            del self.pendientes[clave]
+
+    def compactar(self):
+        """Elimina de 'fallas' las filas de claves que ya se resolvieron (o de copias sustituidas)."""
+        filas = sorted(i for indices in self.pendientes.values() for i in indices)
+        nueva_posicion = {anterior: nueva for nueva, anterior in enumerate(filas)}
+        self.fallas = self.fallas.subconjunto(filas)
+        for clave, indices in self.pendientes.items():
+            self.pendientes[clave] = [nueva_posicion[i] for i in indices]
+        self.descartadas = 0
+
+    def fallas_reales(self):
+        """RegistroBackups ordenado con todos los intentos de las claves sin ninguna ejecución exitosa."""
+        with METRICAS.etapa('clasificacion'):
+            if self.descartadas:
+                self.compactar()
+            return self.fallas.ordenado()
+
+    def catalogos(self):
+        """Catálogos para los filtros: trabajos por servidor, trabajos, servidores, fechas y fechas por (servidor, trabajo)."""
+        servidores, trabajos = self.fallas.servidores.valores, self.fallas.trabajos.valores
+        trabajos_por_servidor = defaultdict(set)
+        fechas_por_servidor_y_trabajo = defaultdict(set)
+        fechas = set()
+        for (codigo_servidor, codigo_trabajo), dias in self.dias_por_clave.items():
+            servidor, trabajo = servidores[codigo_servidor], trabajos[codigo_trabajo]
+            fechas_dia = {desde_epoca(dia * SEGUNDOS_DIA).date() for dia in dias}
+            trabajos_por_servidor[servidor].add(trabajo)
+            fechas_por_servidor_y_trabajo[(servidor, trabajo)] = fechas_dia
+            fechas.update(fechas_dia)
+        return (trabajos_por_servidor, sorted({t for _, t in fechas_por_servidor_y_trabajo}),
+                sorted(trabajos_por_servidor), sorted(fechas), fechas_por_servidor_y_trabajo)
+
+
+def filtrar_fallos_reales(registro):
+    """
+    Devuelve un RegistroBackups solo con las "fallas reales": las ejecuciones de cada (servidor, trabajo, día)
+    en el que no hubo ninguna ejecución exitosa.
+    """
+    return ClasificadorFallos().agregar(registro).fallas_reales()
 
-            for row_idx, row_values in enumerate(sheet.iter_rows(min_row=fila_inicio, values_only=True)):
+
+class MotorConsultas:
+    """
+    Índices sobre un RegistroBackups para resolver los filtros de la interfaz sin recorrer todo el registro.
+    Mantiene listas de filas por servidor, trabajo, estado y día, más un índice ordenado por inicio para
+    rangos de fechas. Una combinación de filtros parte de la lista más corta y comprueba el resto de
+    condiciones sobre las columnas. Los resultados (y el resumen diario de la última falla) se guardan
+    en una pequeña caché, así buscar y exportar con los mismos filtros no repiten el trabajo.
+    """
+    TAMANO_CACHE = 32
+
+    def __init__(self, registro):
+        self.registro = registro
+        self.por_servidor = defaultdict(lambda: array('l'))
+        self.por_trabajo = defaultdict(lambda: array('l'))
+        self.por_estado = defaultdict(lambda: array('l'))
+        self.por_dia = defaultdict(lambda: array('l'))
+        for i, (servidor, trabajo, estado, inicio) in enumerate(zip(registro.servidor, registro.trabajo, registro.estado, registro.inicio)):
+            self.por_servidor[servidor].append(i)
+            self.por_trabajo[trabajo].append(i)
+            self.por_estado[estado].append(i)
+            self.por_dia[inicio // SEGUNDOS_DIA].append(i)
+
+        # Posición de cada fila en el orden de presentación (servidor, trabajo, inicio)
+        servidores, trabajos = registro.servidores.valores, registro.trabajos.valores
+        orden = sorted(range(len(registro)), key=lambda i: (servidores[registro.servidor[i]], trabajos[registro.trabajo[i]], registro.inicio[i]))
+        self.posicion = array('l', bytes(array('l').itemsize * len(registro)))
+        for posicion, i in enumerate(orden):
+            self.posicion[i] = posicion
+
+        # Índice ordenado por inicio para consultas por rango de fechas
+        self.orden_inicio = array('l', sorted(range(len(registro)), key=registro.inicio.__getitem__))
+        self.inicios_ordenados = array('q', (registro.inicio[i] for i in self.orden_inicio))
+        self.cache = OrderedDict()
+
+    def consultar(self, servidor='', trabajo='', fecha='', estado='', desde=None, hasta=None):
+        """
+        Índices de las filas que cumplen los filtros, en orden servidor/trabajo/inicio.
+        Los filtros vacíos no se aplican; 'fecha' es 'AAAA-MM-DD' y 'desde'/'hasta' son date (inclusive).
+        """
+        return self._resolver(servidor, trabajo, fecha, estado, desde, hasta)[0]
+
+    def resumen_diario(self, servidor='', trabajo='', fecha='', estado='', desde=None, hasta=None):
+        """Índices de la última falla de cada (servidor, trabajo, día) entre las filas que cumplen los filtros."""
+        return self._resolver(servidor, trabajo, fecha, estado, desde, hasta)[1]
+
+    def _resolver(self, *filtros):
+        if filtros in self.cache:
+            self.cache.move_to_end(filtros)
+            return self.cache[filtros]
+
+        indices = self._filtrar(*filtros)
+        indices.sort(key=self.posicion.__getitem__)
+
+        # Las filas ya van ordenadas por servidor, trabajo e inicio: basta quedarse con la más reciente de cada día
+        registro = self.registro
+        ultima_por_dia = {}
+        for i in indices:
+            clave = (registro.servidor[i], registro.trabajo[i], registro.inicio[i] // SEGUNDOS_DIA)
+            if clave not in ultima_por_dia or registro.inicio[i] > registro.inicio[ultima_por_dia[clave]]:
+                ultima_por_dia[clave] = i
+        resultado = (indices, list(ultima_por_dia.values()))
+
+        self.cache[filtros] = resultado
+        if len(self.cache) > self.TAMANO_CACHE:
+            self.cache.popitem(last=False)
+        return resultado
+
+    def _filtrar(self, servidor, trabajo, fecha, estado, desde, hasta):
+        registro = self.registro
+        candidatos = [] # Listas de filas de cada filtro activo
+        condiciones = [] # La misma condición expresada sobre las columnas: (columna, mínimo, máximo)
+        for valor, tabla, indice, columna in ((servidor, registro.servidores, self.por_servidor, registro.servidor),
+                                              (trabajo, registro.trabajos, self.por_trabajo, registro.trabajo),
+                                              (estado, registro.estados, self.por_estado, registro.estado)):
+            if not valor:
+                continue
+            codigo = tabla.codigos.get(valor)
+            if codigo is None or codigo not in indice:
+                return []
+            candidatos.append(indice[codigo])
+            condiciones.append((columna, codigo, codigo))
+
+        if fecha:
+            dia = (date.fromisoformat(fecha) - EPOCA.date()).days
+            if dia not in self.por_dia:
+                return []
+            candidatos.append(self.por_dia[dia])
+            condiciones.append((registro.inicio, dia * SEGUNDOS_DIA, (dia + 1) * SEGUNDOS_DIA - 1))
+
+        if desde or hasta:
+            minimo = (desde - EPOCA.date()).days * SEGUNDOS_DIA if desde else self.inicios_ordenados[0] if len(registro) else 0
+            maximo = ((hasta - EPOCA.date()).days + 1) * SEGUNDOS_DIA - 1 if hasta else self.inicios_ordenados[-1] if len(registro) else 0
+            primero = bisect_left(self.inicios_ordenados, minimo)
+            ultimo = bisect_right(self.inicios_ordenados, maximo)
+            candidatos.append(self.orden_inicio[primero:ultimo])
+            condiciones.append((registro.inicio, minimo, maximo))
+
+        if not candidatos:
+            return list(range(len(registro)))
+
+        # Se parte de la lista más corta y se comprueban las demás condiciones directamente en las columnas
+        mas_corta = min(range(len(candidatos)), key=lambda k: len(candidatos[k]))
+        resto = [c for k, c in enumerate(condiciones) if k != mas_corta]
+        return [i for i in candidatos[mas_corta]
+                if all(minimo <= columna[i] <= maximo for columna, minimo, maximo in resto)]
+
+
+
+# Formatos de fecha habituales en los informes; se prueban en este orden para deducir el de cada archivo.
+# El mes va antes que el día (como en dateutil) y el formato día/mes solo se elige si la muestra lo exige.
+FORMATOS_FECHA = [
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y %H:%M',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d.%m.%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S',
+]
+TAMANO_MUESTRA_FECHAS = 200
+TAMANO_LOTE = 5000 # Filas que se convierten juntas al leer un informe
+
+
+class ConversorFechas:
+    """
+    Convierte las celdas de fecha de un informe.
+    Las celdas que openpyxl ya devuelve como datetime se usan tal cual; las de texto se convierten con el
+    formato fijo deducido de una muestra del archivo y solo las que no encajan pasan por dateutil.
+    'contadores' registra cuántas celdas se resolvieron por cada vía.
+    """
+
+    def __init__(self, muestra):
+        self.formato = self.deducir_formato(muestra)
+        self.contadores = Counter()
+
+    @staticmethod
+    def deducir_formato(muestra):
+        """Devuelve el formato que encaja con más valores de la muestra (o None si ninguno encaja)."""
+        textos = [v.strip() for v in muestra if isinstance(v, str) and v.strip()]
+        if not textos:
+            return None
+        # Muestra repartida por todo el lote para no depender solo de las primeras filas
+        paso = max(1, len(textos) // TAMANO_MUESTRA_FECHAS)
+        textos = textos[::paso][:TAMANO_MUESTRA_FECHAS]
+
+        mejor_formato, mejor_aciertos = None, 0
+        for formato in FORMATOS_FECHA:
+            aciertos = 0
+            for texto in textos:
                 try:
-                    # Acceso a los valores usando los índices de columna encontrados
-                    servidor = str(row_values[headers['object name']]).strip()
-                    if not servidor: # Saltar filas sin nombre de servidor
-                        continue
-
-                    # Asegurar que las fechas se parseen correctamente, manejando posibles tipos de datos de Excel
-                    start_time_val = row_values[headers['start time']]
-                    finish_time_val = row_values[headers['finish time']]
-
-                    fecha_inicio = parser.parse(str(start_time_val)) if isinstance(start_time_val, (str, datetime)) else None
-                    fecha_fin = parser.parse(str(finish_time_val)) if isinstance(finish_time_val, (str, datetime)) else None
-
-                    if not fecha_inicio or not fecha_fin: # Saltar si las fechas no son válidas
-                        logging.warning(f"Fila {fila_inicio + row_idx} en {archivo}: Fecha de inicio/fin inválida ('{start_time_val}'/'{finish_time_val}'). Se saltará.")
-                        continue
-
-                    estado = str(row_values[headers['backup status']]).lower().strip()
-                    trabajo = str(row_values[headers['job name']]).strip()
-
-                    backup = {
-                        'nombre_trabajo': trabajo,
-                        'inicio': fecha_inicio,
-                        'fin': fecha_fin,
-                        'duracion': row_values[headers['duration']],
-                        'data_read': row_values[headers['data read, gb']],
-                        'tamano_backup': row_values[headers['actual total backup size, gb']],
-                        'estado': estado
-                    }
-
-                    backups_por_servidor[servidor].append(backup)
-                    trabajos.add(trabajo)
-                    trabajos_por_servidor[servidor].add(trabajo)
-                    servidores.add(servidor)
-                    fechas.add(fecha_inicio.date())
-                    fechas_por_servidor_y_trabajo[(servidor, trabajo)].add(fecha_inicio.date())
-                except Exception as e:
-                    logging.warning(f"Error procesando fila {fila_inicio + row_idx} de {archivo}: {e}. Datos de fila: {row_values}")
-        except Exception as e:
-            logging.error(f"No se pudo procesar el archivo {archivo}: {e}")
+                    datetime.strptime(texto, formato)
+                    aciertos += 1
+                except ValueError:
+                    pass
+            if aciertos > mejor_aciertos:
+                mejor_formato, mejor_aciertos = formato, aciertos
+        return mejor_formato
+
+    def convertir_lote(self, valores):
+        formato = self.formato
+        strptime = datetime.strptime
+        convertidas = []
+        nativas = por_formato = por_dateutil = invalidas = 0
+        for valor in valores:
+            if isinstance(valor, datetime):
+                convertidas.append(valor)
+                nativas += 1
+                continue
+            if not isinstance(valor, str):
+                convertidas.append(None)
+                invalidas += 1
+                continue
+            if formato:
+                try:
+                    convertidas.append(strptime(valor.strip(), formato))
+                    por_formato += 1
+                    continue
+                except ValueError:
+                    pass
+            try:
+                convertidas.append(parser.parse(valor))
+                por_dateutil += 1
+            except (ValueError, OverflowError):
+                convertidas.append(None)
+                invalidas += 1
+
+        self.contadores['nativa'] += nativas
+        self.contadores['formato'] += por_formato
+        self.contadores['dateutil'] += por_dateutil
+        self.contadores['invalida'] += invalidas
+        return convertidas
+
+
+# --- Lectores de informes (XLSX, CSV y comprimidos) ---
+class LectorXlsx:
+    """Filas de la hoja activa de un libro XLSX, leídas en streaming (modo de solo lectura de openpyxl)."""
+    codificacion = None # Solo los formatos de texto la tienen
+
+    def __init__(self, origen):
+        if not isinstance(origen, str):
+            # Un libro XLSX es a su vez un zip y openpyxl salta por él (también desde el final); dentro de un
+            # .zip o un .gz eso obligaría a descomprimir una y otra vez, así que se copia a memoria (no al disco)
+            origen = io.BytesIO(origen.read())
+        self.libro = openpyxl.load_workbook(origen, read_only=True, data_only=True)
+
+    def filas(self):
+        hoja = self.libro.active
+        # Algunos exportadores guardan una dimensión incorrecta (p. ej. "A1") que truncaría la lectura
+        hoja.reset_dimensions()
+        return hoja.iter_rows(values_only=True)
+
+    def cerrar(self):
+        self.libro.close() # En modo de solo lectura el archivo queda abierto hasta cerrarlo explícitamente
+
+
+class LectorCsv:
+    """
+    Filas de un informe CSV como listas de textos (las fechas y números los convierte quien las lee).
+    El separador se deduce de las primeras líneas, que se vuelven a entregar al lector sin retroceder
+    en el flujo, así también sirve para flujos comprimidos que solo se leen hacia adelante.
+    'codificacion' queda con la que se usó al terminar de leer (ver lineas).
+    """
+    LINEAS_MUESTRA = 20 # Las mismas filas en las que buscar_encabezados busca los encabezados
+    SEPARADORES = ',;\t|'
+
+    def __init__(self, origen):
+        self.propio = isinstance(origen, str)
+        self.binario = open(origen, 'rb') if self.propio else origen
+        self.nombre = origen if self.propio else getattr(origen, 'name', 'CSV')
+        self.codificacion = CODIFICACION_CSV
+        self.texto = None
+
+    def lineas(self):
+        """
+        Líneas de texto, sin reemplazar caracteres: con BOM UTF-16 (exportaciones de PowerShell) se lee como
+        UTF-16; si no, cada línea en CODIFICACION_CSV y, desde la primera que no lo sea, en la siguiente de
+        CODIFICACIONES_ALTERNATIVAS_CSV (las anteriores eran ASCII o válidas en ambas, así que no cambian).
+        """
+        if self.binario.peek(2)[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+            self.codificacion = 'utf-16'
+            self.texto = io.TextIOWrapper(self.binario, encoding='utf-16', newline='')
+            for linea in self.texto: # Sin 'yield from', que al cerrar el generador cerraría también el flujo
+                yield linea
+            return
+        alternativas = iter(c for c in CODIFICACIONES_ALTERNATIVAS_CSV if c != self.codificacion)
+        for linea in self.binario:
+            while True:
+                try:
+                    texto = linea.decode(self.codificacion)
+                    break
+                except UnicodeDecodeError as e:
+                    siguiente = next(alternativas, None)
+                    if siguiente is None:
+                        raise
+                    anterior, self.codificacion = self.codificacion, siguiente
+                    logging.warning(f"{self.nombre} no está en {anterior} ({e}); se lee como {self.codificacion}.")
+            yield texto
+
+    @staticmethod
+    def deducir_separador(muestra):
+        """
+        El separador presente en más líneas de la muestra (y, a igualdad, el más repetido); ',' si no hay ninguno.
+        Más tolerante que csv.Sniffer con las filas de título previas a los encabezados.
+        """
+        mejor_separador, mejor_puntaje = ',', (0, 0)
+        for separador in LectorCsv.SEPARADORES:
+            puntaje = (sum(1 for linea in muestra if separador in linea), sum(linea.count(separador) for linea in muestra))
+            if puntaje > mejor_puntaje:
+                mejor_separador, mejor_puntaje = separador, puntaje
+        return mejor_separador
+
+    def filas(self):
+        lineas = self.lineas()
+        muestra = list(islice(lineas, self.LINEAS_MUESTRA))
+        return csv.reader(chain(muestra, lineas), delimiter=self.deducir_separador(muestra))
+
+    def cerrar(self):
+        # Sin cerrar el flujo recibido: lo cierra quien lo abrió (el .zip o el .gz que lo contiene)
+        if self.texto is not None:
+            self.texto.detach()
+        if self.propio:
+            self.binario.close()
+
+
+# Lector de cada extensión; para admitir otro formato basta con registrar aquí una clase con filas(), cerrar()
+# y 'codificacion' (None si no es un formato de texto)
+LECTORES_INFORME = {'.xlsx': LectorXlsx, '.csv': LectorCsv}
+
+
+def tipo_informe(nombre):
+    """
+    Devuelve (compresión, extensión) de un informe soportado, o None si no lo es.
+    La compresión es '.zip', '.gz' o None; en un '.zip' la extensión es la de cada miembro (None aquí).
+    """
+    base, extension = os.path.splitext(nombre.lower())
+    if extension == '.zip':
+        return '.zip', None
+    compresion = None
+    if extension == '.gz':
+        compresion = '.gz'
+        extension = os.path.splitext(base)[1]
+    if extension not in LECTORES_INFORME:
+        return None
+    return compresion, extension
+
+
+def es_informe(nombre):
+    return tipo_informe(nombre) is not None
+
+
+def listar_informes(ruta_informes):
+    """Informes de la carpeta en cualquier formato soportado, ordenados para que el resultado no dependa del sistema."""
+    return sorted(os.path.join(ruta_informes, f) for f in os.listdir(ruta_informes) if es_informe(f))
+
+
+def tablas_informe(archivo, codificaciones=None):
+    """
+    Generador de (nombre, filas): una tabla por informe, con 'filas' como iterador de filas (secuencias de
+    valores) igual para todos los formatos. Un .zip entrega una tabla por cada informe que contiene, en
+    orden alfabético. Los comprimidos se leen como flujos, sin extraerlos al disco; cada tabla se cierra
+    al pedir la siguiente. Si se pasa el conjunto 'codificaciones', se le añaden las de las tablas de texto.
+    """
+    compresion, extension = tipo_informe(archivo)
+    if compresion != '.zip':
+        yield from tablas_flujo(archivo, archivo, compresion, extension, codificaciones)
+        return
+    with zipfile.ZipFile(archivo) as paquete:
+        for miembro in sorted(paquete.infolist(), key=lambda m: m.filename):
+            tipo = tipo_informe(miembro.filename)
+            if miembro.is_dir() or tipo is None or tipo[0] == '.zip':
+                continue
+            with paquete.open(miembro) as flujo:
+                yield from tablas_flujo(f"{archivo}!{miembro.filename}", flujo, *tipo, codificaciones)
+
+
+def tablas_flujo(nombre, origen, compresion, extension, codificaciones=None):
+    flujo = gzip.open(origen, 'rb') if compresion == '.gz' else None
+    try:
+        lector = LECTORES_INFORME[extension](flujo or origen)
+        try:
+            yield nombre, lector.filas()
+        finally:
+            lector.cerrar()
+            if codificaciones is not None and lector.codificacion:
+                codificaciones.add(lector.codificacion)
+    finally:
+        if flujo is not None:
+            flujo.close()
+
+
+def procesar_archivo(archivo, metricas=None):
+    """
+    Lee un informe (XLSX, CSV o comprimido, ver tablas_informe) y devuelve sus ejecuciones como un
+    RegistroBackups serializado (ver RegistroBackups.serializar), ya que se ejecuta dentro de los procesos de trabajo.
+    Devuelve None si el archivo no se pudo leer, para no guardar en caché un resultado incompleto.
+    Si se pasa un diccionario 'metricas', se completa con los tiempos de cada etapa, las filas leídas
+    y descartadas por motivo y las fechas resueltas por cada vía (ver MetricasIngesta).
+    """
+    metricas = {} if metricas is None else metricas
+    segundos = metricas.setdefault('segundos', {})
+    filas_contadas = metricas.setdefault('filas', Counter())
+    metricas['origen'] = 'procesado'
+    metricas['formato'] = ''.join(parte for parte in reversed(tipo_informe(archivo)) if parte).lstrip('.') # 'xlsx', 'csv.gz', 'zip'...
+    avisos = AvisosMuestreados(archivo)
+    ejecuciones = RegistroBackups()
+    fechas = Counter()
+    codificaciones = set()
+    tablas = tablas_informe(archivo, codificaciones)
+    con_encabezados = 0
+    try:
+        while True:
+            # Abrir cada tabla (y su archivo o miembro comprimido) cuenta como 'abrir_libro'
+            inicio_etapa = perf_counter()
+            tabla = next(tablas, None)
+            segundos['abrir_libro'] = segundos.get('abrir_libro', 0.0) + perf_counter() - inicio_etapa
+            if tabla is None:
+                break
+            conversor = leer_tabla(*tabla, ejecuciones, filas_contadas, avisos, segundos)
+            if conversor is None:
+                continue
+            con_encabezados += 1
+            fechas.update(conversor.contadores)
+            if metricas.get('formato_fecha') is None: # El de la primera tabla con fechas de texto
+                metricas['formato_fecha'] = conversor.formato
+            logging.info(f"Fechas en {tabla[0]}: formato detectado {conversor.formato!r}, celdas por vía {dict(conversor.contadores)}")
+        if not con_encabezados:
+            metricas['error'] = "encabezados no encontrados"
+        filas_contadas['validas'] = len(ejecuciones)
+        metricas['fechas'] = dict(fechas)
+    except Exception as e:
+        logging.error(f"No se pudo procesar el archivo {archivo}: {e}")
+        metricas['error'] = str(e)
+        return None
+    finally:
+        tablas.close()
+        if codificaciones:
+            metricas['codificacion'] = ", ".join(sorted(codificaciones))
+        metricas['avisos_omitidos'] = avisos.resumir()
+        metricas['filas'] = dict(filas_contadas)
+    return ejecuciones.serializar()
+
+
+def leer_tabla(nombre, filas, ejecuciones, filas_contadas, avisos, segundos):
+    """
+    Añade a 'ejecuciones' las filas de una tabla de un informe. Devuelve el ConversorFechas usado,
+    o None si la tabla no tiene todos los encabezados (se salta sin leer el resto de sus filas).
+    """
+    inicio_etapa = perf_counter()
+    headers, fila_inicio = buscar_encabezados(filas)
+    segundos['encabezados'] = segundos.get('encabezados', 0.0) + perf_counter() - inicio_etapa
+    if not headers:
+        logging.error(f"No se encontraron todos los encabezados válidos en {nombre}. Se saltará este archivo.")
+        return None
+
+    inicio_etapa = perf_counter()
+    # Las filas pueden llegar sin las celdas vacías del final; se completan hasta la última columna usada
+    ancho = max(headers.values()) + 1
+    col_inicio, col_fin = headers['start time'], headers['finish time']
+    conversor = None
+    fila_lote = fila_inicio # Número de fila (en la hoja) de la primera fila de cada lote
+    while True:
+        lote = [tuple(row) + (None,) * (ancho - len(row)) if len(row) < ancho else row
+                for row in islice(filas, TAMANO_LOTE)]
+        if not lote:
+            break
+        filas_contadas['leidas'] += len(lote)
+
+        # El formato de las fechas se deduce una sola vez por tabla, con la muestra del primer lote
+        if conversor is None:
+            conversor = ConversorFechas([r[col_inicio] for r in lote] + [r[col_fin] for r in lote])
+        fechas_inicio = conversor.convertir_lote([r[col_inicio] for r in lote])
+        fechas_fin = conversor.convertir_lote([r[col_fin] for r in lote])
+
+        for row_idx, row_values in enumerate(lote):
+            try:
+                # Acceso a los valores usando los índices de columna encontrados
+                servidor = str(row_values[headers['object name']]).strip()
+                if not servidor: # Saltar filas sin nombre de servidor
+                    filas_contadas['sin_servidor'] += 1
+                    continue
+
+                fecha_inicio = fechas_inicio[row_idx]
+                fecha_fin = fechas_fin[row_idx]
+                if not fecha_inicio or not fecha_fin: # Saltar si las fechas no son válidas
+                    filas_contadas['fecha_invalida'] += 1
+                    if avisos.permitir('fecha_invalida'):
+                        logging.warning(f"Fila {fila_lote + row_idx} en {nombre}: Fecha de inicio/fin inválida ('{row_values[col_inicio]}'/'{row_values[col_fin]}'). Se saltará.")
+                    continue
+
+                estado = str(row_values[headers['backup status']]).lower().strip()
+                trabajo = str(row_values[headers['job name']]).strip()
+
+                ejecuciones.agregar(
+                    servidor, trabajo, fecha_inicio, fecha_fin,
+                    row_values[headers['duration']],
+                    row_values[headers['data read, gb']],
+                    row_values[headers['actual total backup size, gb']],
+                    estado
+                )
+            except Exception as e:
+                filas_contadas['error_fila'] += 1
+                if avisos.permitir('error_fila'):
+                    logging.warning(f"Error procesando fila {fila_lote + row_idx} de {nombre}: {e}")
+        fila_lote += len(lote)
+    segundos['filas'] = segundos.get('filas', 0.0) + perf_counter() - inicio_etapa
+    return conversor or ConversorFechas([])
+
+
+def procesar_archivo_medido(archivo):
+    """procesar_archivo para el pool de procesos: devuelve (datos, métricas del archivo)."""
+    metricas = {}
+    datos = procesar_archivo(archivo, metricas)
+    return datos, metricas
+
+
+def leer_archivos(archivos, procesos=None, metricas_ingesta=None):
+    """
+    Reparte los archivos entre un pool de procesos y entrega pares (archivo, resultado), en el mismo orden, a
+    medida que terminan (es un generador: quien consume puede ir incorporándolos sin acumularlos en memoria).
+    Con un solo proceso (o un solo archivo) se lee en el proceso actual para evitar el coste del pool.
+    Las métricas de cada archivo se acumulan en metricas_ingesta (por defecto, METRICAS).
+    """
+    metricas_ingesta = METRICAS if metricas_ingesta is None else metricas_ingesta
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(archivos) <= 1:
+        for archivo in archivos:
+            datos, metricas = procesar_archivo_medido(archivo)
+            metricas_ingesta.registrar_archivo(archivo, metricas)
+            yield archivo, datos
+        return
+    with ProcessPoolExecutor(max_workers=min(procesos, len(archivos))) as pool:
+        for archivo, (datos, metricas) in zip(archivos, pool.map(procesar_archivo_medido, archivos)):
+            metricas_ingesta.registrar_archivo(archivo, metricas)
+            yield archivo, datos
+
+
+# --- Caché de informes procesados ---
+def abrir_cache(ruta_cache):
+    """
+    Abre (o crea) la caché SQLite de informes procesados.
+    Si la tabla de aliases de encabezados cambió desde la última ejecución, se vacía la caché.
+    Si el archivo está dañado (o no es una base SQLite) se descarta y se crea de nuevo: es solo una caché.
+    """
+    try:
+        return preparar_cache(ruta_cache)
+    except sqlite3.OperationalError: # P. ej. bloqueada por otra ejecución: no está dañada, no se borra
+        raise
+    except sqlite3.DatabaseError as e:
+        logging.error(f"La caché de informes {ruta_cache} está dañada ({e}); se vuelve a crear.")
+        os.remove(ruta_cache)
+        return preparar_cache(ruta_cache)
+
+
+def preparar_cache(ruta_cache):
+    conexion = sqlite3.connect(ruta_cache)
+    try:
+        conexion.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+        conexion.execute("CREATE TABLE IF NOT EXISTS informes (ruta TEXT PRIMARY KEY, tamano INTEGER, mtime INTEGER, hash TEXT, datos BLOB)")
+        conexion.execute("CREATE INDEX IF NOT EXISTS idx_informes_hash ON informes (hash)")
+        fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'firma_encabezados'").fetchone()
+        if not fila or fila[0] != FIRMA_ENCABEZADOS:
+            if fila:
+                logging.info("La tabla de encabezados cambió: se invalida la caché de informes.")
+            invalidar_cache(conexion)
+    except sqlite3.DatabaseError:
+        conexion.close() # Cerrar antes de que abrir_cache borre el archivo
+        raise
+    return conexion
+
+
+def invalidar_cache(conexion):
+    """Elimina todos los informes guardados en la caché y registra la firma de encabezados actual."""
+    with conexion:
+        conexion.execute("DELETE FROM informes")
+        conexion.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('firma_encabezados', ?)", (FIRMA_ENCABEZADOS,))
+
+
+def hash_archivo(archivo):
+    h = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def codificar_cache(datos):
+    """Comprime datos de RegistroBackups.serializar. Se usa marshal (solo tipos básicos): leerlos no ejecuta código."""
+    return zlib.compress(marshal.dumps(datos))
+
+
+def decodificar_cache(contenido):
+    """Inversa de codificar_cache; ValueError si el contenido está truncado o dañado."""
+    try:
+        datos = marshal.loads(zlib.decompress(contenido))
+    except (zlib.error, EOFError, ValueError, TypeError) as e:
+        raise ValueError(f"contenido ilegible ({e})")
+    vacio = RegistroBackups()
+    if not (isinstance(datos, tuple) and len(datos) == 4 and all(isinstance(tabla, list) for tabla in datos[:3])
+            and isinstance(datos[3], tuple) and len(datos[3]) == len(COLUMNAS_REGISTRO)
+            and len({len(contenido_columna) / getattr(vacio, columna).itemsize
+                     for columna, contenido_columna in zip(COLUMNAS_REGISTRO, datos[3])}) == 1):
+        raise ValueError("contenido con una forma inesperada")
+    return datos
+
+
+def leer_archivos_con_cache(archivos, procesos=None, ruta_cache=RUTA_CACHE, podar=True, metricas_ingesta=None):
+    """
+    Igual que leer_archivos, pero solo procesa los informes nuevos o modificados.
+    Un informe se reutiliza si coinciden ruta, tamaño y fecha de modificación, o si su contenido
+    (hash SHA-256) coincide con uno ya guardado (p. ej. un archivo copiado o tocado sin cambios).
+    Entrega los informes en el orden de 'archivos', vengan de la caché o recién procesados.
+    Una fila dañada o una consulta que falla cuentan como informe no guardado: se procesa y se vuelve a escribir.
+    Con podar=True (lectura de la carpeta completa) se olvidan los informes que ya no están en 'archivos'.
+    """
+    metricas_ingesta = METRICAS if metricas_ingesta is None else metricas_ingesta
+    if not ruta_cache:
+        yield from leer_archivos(archivos, procesos, metricas_ingesta)
+        return
+
+    try:
+        conexion = abrir_cache(ruta_cache)
+    except (sqlite3.Error, OSError) as e: # Sin caché utilizable (p. ej. sin permisos): se leen todos los informes
+        logging.error(f"No se pudo usar la caché de informes {ruta_cache}: {e}")
+        yield from leer_archivos(archivos, procesos, metricas_ingesta)
+        return
+    try:
+        # Por archivo: (datos comprimidos de la caché o None si hay que procesarlo, segundos, (tamaño, mtime, hash))
+        entradas = []
+        for archivo in archivos:
+            inicio_etapa = perf_counter()
+            info = os.stat(archivo)
+            huella = None # Se calcula solo si no coinciden tamaño y fecha
+            try:
+                fila = conexion.execute("SELECT tamano, mtime, datos FROM informes WHERE ruta = ?", (archivo,)).fetchone()
+                if fila and fila[0] == info.st_size and fila[1] == info.st_mtime_ns:
+                    entradas.append((fila[2], perf_counter() - inicio_etapa, (info.st_size, info.st_mtime_ns, None)))
+                    continue
+
+                huella = hash_archivo(archivo)
+                fila = conexion.execute("SELECT datos FROM informes WHERE hash = ?", (huella,)).fetchone()
+                if fila:
+                    with conexion:
+                        conexion.execute("INSERT OR REPLACE INTO informes (ruta, tamano, mtime, hash, datos) VALUES (?, ?, ?, ?, ?)",
+                                         (archivo, info.st_size, info.st_mtime_ns, huella, fila[0]))
+                    entradas.append((fila[0], perf_counter() - inicio_etapa, (info.st_size, info.st_mtime_ns, huella)))
+                    continue
+            except sqlite3.Error as e: # P. ej. una página dañada o la base bloqueada por otra ejecución
+                logging.error(f"Caché de informes: no se pudo consultar {archivo} ({e}); se procesa de nuevo.")
+            metricas_ingesta.sumar_etapa('cache', perf_counter() - inicio_etapa, veces=0) # Coste de comprobar y calcular el hash
+            entradas.append((None, 0.0, (info.st_size, info.st_mtime_ns, huella)))
+
+        pendientes = [archivo for archivo, (comprimidos, _, _) in zip(archivos, entradas) if comprimidos is None]
+        logging.info(f"Caché de informes: {len(archivos) - len(pendientes)} reutilizados, {len(pendientes)} por procesar.")
+        # Se intercalan en el orden de 'archivos': a igualdad total entre copias de una ejecución, qué informe
+        # cuenta el duplicado depende de cuál llega primero, y eso no debe cambiar según lo que ya esté en la caché
+        procesados = leer_archivos(pendientes, procesos, metricas_ingesta)
+        for archivo, (comprimidos, segundos, firma) in zip(archivos, entradas):
+            if comprimidos is not None:
+                inicio_etapa = perf_counter()
+                try:
+                    datos = decodificar_cache(comprimidos)
+                except ValueError as e:
+                    logging.error(f"Caché de informes: la copia de {archivo} está dañada ({e}); se procesa de nuevo.")
+                    datos = None
+                if datos is not None:
+                    metricas_ingesta.registrar_archivo(archivo, {'origen': 'cache', 'segundos': {'cache': segundos + perf_counter() - inicio_etapa}})
+                    yield archivo, datos
+                    continue
+                datos, metricas = procesar_archivo_medido(archivo) # Caso raro: se procesa aquí mismo, sin el pool
+                metricas_ingesta.registrar_archivo(archivo, metricas)
+            else:
+                _, datos = next(procesados)
+            if datos is not None: # Si no se pudo leer, se reintentará en la próxima ejecución
+                guardar_en_cache(conexion, archivo, firma, datos)
+            yield archivo, datos
+        procesados.close()
+
+        if not podar:
+            return
+        # Olvidar los informes que ya no están en la carpeta
+        vigentes = set(archivos)
+        try:
+            with conexion:
+                for (ruta,) in conexion.execute("SELECT ruta FROM informes").fetchall():
+                    if ruta not in vigentes:
+                        conexion.execute("DELETE FROM informes WHERE ruta = ?", (ruta,))
+        except sqlite3.Error as e:
+            logging.error(f"Caché de informes: no se pudieron olvidar los informes eliminados ({e}).")
+    finally:
+        conexion.close()
+
+
+def guardar_en_cache(conexion, archivo, firma, datos):
+    """
+    Guarda (o reemplaza) la fila de un informe recién procesado; firma = (tamaño, mtime, hash o None).
+    Si falla, solo se pierde la caché de ese informe.
+    """
+    tamano, mtime, huella = firma
+    try:
+        huella = huella or hash_archivo(archivo)
+        with conexion:
+            # Otras filas con el mismo contenido pueden compartir una copia dañada: se reemplazan también
+            conexion.execute("DELETE FROM informes WHERE hash = ?", (huella,))
+            conexion.execute("INSERT OR REPLACE INTO informes (ruta, tamano, mtime, hash, datos) VALUES (?, ?, ?, ?, ?)",
+                             (archivo, tamano, mtime, huella, codificar_cache(datos)))
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Caché de informes: no se pudo guardar {archivo} ({e}).")
+
+
+def analizar_informes(ruta_informes, procesos=PROCESOS_INGESTA, ruta_cache=RUTA_CACHE, historial=None):
+    """
+    Carga todos los informes de la carpeta y devuelve las fallas reales (RegistroBackups) junto con
+    los catálogos de trabajos, servidores y fechas que usan los filtros de la interfaz.
+    Las fallas se clasifican a medida que llega cada informe, sin guardar el historial completo, salvo que
+    se pase 'historial' (un RegistroBackups): entonces se le añaden todas las ejecuciones leídas (con duplicados).
+    Al terminar se guarda el informe de métricas de la carga (ver MetricasIngesta).
+    """
+    METRICAS.reiniciar()
+    clasificador = ClasificadorFallos()
+
+    archivos = listar_informes(ruta_informes)
+    if not archivos:
+        logging.warning(f"No hay informes (XLSX, CSV o comprimidos) en la carpeta de informes: {ruta_informes}")
+    else:
+        for archivo, datos in leer_archivos_con_cache(archivos, procesos, ruta_cache):
+            if datos is not None:
+                parcial = RegistroBackups.deserializar(datos)
+                clasificador.agregar(parcial, archivo)
+                if historial is not None:
+                    historial.extender(parcial)
+
+    resultado = (clasificador.fallas_reales(),) + clasificador.catalogos()
+    METRICAS.guardar()
+    return resultado
+
+
+def historial_completo(ruta_informes, procesos=PROCESOS_INGESTA, ruta_cache=RUTA_CACHE):
+    """
+    Todas las ejecuciones de la carpeta (también las exitosas, que analizar_informes no conserva), sin
+    duplicados entre informes. Es la entrada del análisis de tendencias cuando no hay histórico.
+    Es una segunda lectura de la carpeta: sus tiempos y contadores no se suman a los de la carga en METRICAS.
+    """
+    historial = RegistroBackups()
+    archivos = listar_informes(ruta_informes)
+    for _, datos in leer_archivos_con_cache(archivos, procesos, ruta_cache, podar=False, metricas_ingesta=MetricasIngesta(None)):
+        if datos is not None:
+            historial.extender(RegistroBackups.deserializar(datos))
+    return historial.subconjunto(ejecuciones_unicas(historial))
+
+
+# --- Tendencias de duración y tamaño (NumPy, dependencia opcional) ---
+ANALIZAR_TENDENCIAS = True # Calcular en segundo plano las anomalías de duración y tamaño (requiere numpy)
+VENTANA_TENDENCIA = 14 # Ejecuciones exitosas anteriores de cada (servidor, trabajo) que forman la referencia
+MIN_HISTORIA_TENDENCIA = 5 # Mínimo de ejecuciones de referencia para evaluar una ejecución
+UMBRAL_Z_ANOMALIA = 3.0 # |z| a partir del cual una duración (hacia arriba) o un tamaño (hacia abajo) es anómalo
+DESVIACION_MINIMA_RELATIVA = 0.05 # Piso de la desviación (fracción de la media) para trabajos muy regulares
+PERCENTIL_REFERENCIA = 95 # Percentil histórico de cada (servidor, trabajo) que se muestra junto a la anomalía
 
-    backups_filtrados = filtrar_fallos_reales(backups_por_servidor)
-    return backups_filtrados, trabajos_por_servidor, sorted(trabajos), sorted(servidores), sorted(fechas), fechas_por_servidor_y_trabajo
 
+def importar_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("El análisis de tendencias necesita el paquete 'numpy' (pip install numpy).")
+    return numpy
+
+
+class RegistroAnomalias(RegistroBackups):
+    """RegistroBackups de ejecuciones anómalas, con el motivo de cada una en el campo 'detalle'."""
+
+    def __init__(self):
+        super().__init__()
+        self.detalles = []
+
+    @classmethod
+    def desde(cls, registro, indices, detalles):
+        anomalias = cls()
+        origen = registro.subconjunto(indices)
+        anomalias.servidores, anomalias.trabajos, anomalias.estados = origen.servidores, origen.trabajos, origen.estados
+        for columna in COLUMNAS_REGISTRO:
+            setattr(anomalias, columna, getattr(origen, columna))
+        anomalias.detalles = list(detalles)
+        return anomalias
 
-def exportar_excel(resultados):
+    def valor(self, indice, campo):
+        if campo == 'detalle':
+            return self.detalles[indice]
+        return super().valor(indice, campo)
+
+
+class AnalisisTendencias:
+    """
+    Estadísticas de duración y tamaño de backup por (servidor, trabajo) sobre el historial completo,
+    calculadas por columnas con NumPy (sin bucles por fila).
+    Cada ejecución se compara con la media móvil y la desviación de las VENTANA_TENDENCIA ejecuciones
+    exitosas anteriores del mismo trabajo (sumas acumuladas por grupo, así el coste es lineal); su
+    puntuación z marca los picos de duración y las caídas de tamaño de las ejecuciones que no fallaron
+    (las fallidas ya aparecen en la vista de fallas). También calcula, por (servidor, trabajo), el
+    percentil PERCENTIL_REFERENCIA de cada métrica sobre todas sus ejecuciones exitosas.
+    """
+    COLUMNAS = (('duracion', 1), ('tamano_backup', -1)) # Columna y sentido de la anomalía (1 = pico, -1 = caída)
+
+    def __init__(self, historial, ventana=VENTANA_TENDENCIA, minimo=MIN_HISTORIA_TENDENCIA):
+        np = importar_numpy()
+        self.historial = historial
+        self.media, self.z, self.percentil = {}, {}, {}
+        n = len(historial)
+        if not n:
+            return
+
+        servidor = np.asarray(historial.servidor, dtype=np.int64)
+        grupo = servidor * max(1, len(historial.trabajos)) + np.asarray(historial.trabajo, dtype=np.int64)
+        estado = np.asarray(historial.estado)
+        exito = estado == historial.estados.codigos.get('success', -1)
+        evaluable = estado != historial.estados.codigos.get('failed', -1)
+
+        # Orden por (servidor, trabajo, inicio) y posición donde empieza el grupo de cada fila
+        orden = np.lexsort((np.asarray(historial.inicio), grupo))
+        grupo_ordenado = grupo[orden]
+        nuevo_grupo = np.ones(n, dtype=bool)
+        nuevo_grupo[1:] = grupo_ordenado[1:] != grupo_ordenado[:-1]
+        inicio_grupo = np.maximum.accumulate(np.where(nuevo_grupo, np.arange(n), 0))
+        _, grupo_denso = np.unique(grupo, return_inverse=True)
+
+        for columna, _ in self.COLUMNAS:
+            valores = np.asarray(getattr(historial, columna))
+            x = valores[orden]
+            valido = exito[orden] & ~np.isnan(x)
+            x0 = np.where(valido, x, 0.0)
+            # Sumas acumuladas con un cero delante: la suma de [a, b) es S[b] - S[a]
+            S = np.concatenate(([0.0], np.cumsum(x0)))
+            S2 = np.concatenate(([0.0], np.cumsum(x0 * x0)))
+            C = np.concatenate(([0], np.cumsum(valido)))
+            # Ventana: las últimas 'ventana' ejecuciones válidas antes de cada fila, sin salir de su grupo
+            desde = np.maximum(np.searchsorted(C, C[:-1] - ventana, side='left'), inicio_grupo)
+            cantidad = C[:-1] - C[desde]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                media = (S[:-1] - S[desde]) / cantidad
+                desviacion = np.sqrt(np.maximum((S2[:-1] - S2[desde]) / cantidad - media * media, 0.0))
+                desviacion = np.maximum(desviacion, DESVIACION_MINIMA_RELATIVA * np.abs(media))
+                z = (x - media) / desviacion
+            z[(cantidad < minimo) | ~(desviacion > 0)] = np.nan
+
+            self.media[columna] = np.empty(n)
+            self.media[columna][orden] = media
+            self.z[columna] = np.empty(n)
+            self.z[columna][orden] = z
+            self.z[columna][~evaluable] = np.nan
+            self.percentil[columna] = self.percentil_por_grupo(np, grupo_denso, valores, exito & ~np.isnan(valores))
+
+    @staticmethod
+    def percentil_por_grupo(np, grupo, valores, valido, percentil=PERCENTIL_REFERENCIA):
+        """Percentil (interpolación lineal) de los valores válidos de cada grupo, devuelto por fila."""
+        resultado = np.full(len(valores), np.nan)
+        filas = np.nonzero(valido)[0]
+        if not len(filas):
+            return resultado
+        orden = filas[np.lexsort((valores[filas], grupo[filas]))]
+        grupos, primero, cantidad = np.unique(grupo[orden], return_index=True, return_counts=True)
+        posicion = primero + (cantidad - 1) * (percentil / 100.0)
+        bajo, alto = np.floor(posicion).astype(np.int64), np.ceil(posicion).astype(np.int64)
+        ordenados = valores[orden]
+        por_grupo = np.full(grupo.max() + 1, np.nan)
+        por_grupo[grupos] = ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (posicion - bajo)
+        return por_grupo[grupo]
+
+    def anomalias(self, umbral=UMBRAL_Z_ANOMALIA):
+        """RegistroAnomalias con las ejecuciones marcadas, ordenadas como las fallas (servidor, inicio, trabajo)."""
+        if not len(self.historial):
+            return RegistroAnomalias()
+        np = importar_numpy()
+        marcadas = np.zeros(len(self.historial), dtype=bool)
+        for columna, sentido in self.COLUMNAS:
+            with np.errstate(invalid='ignore'):
+                marcadas |= sentido * self.z[columna] >= umbral
+
+        historial = self.historial
+        servidores, trabajos = historial.servidores.valores, historial.trabajos.valores
+        indices = sorted(np.nonzero(marcadas)[0].tolist(), key=lambda i: (servidores[historial.servidor[i]], historial.inicio[i],
+                                                                         trabajos[historial.trabajo[i]]))
+        return RegistroAnomalias.desde(historial, indices, (self.detalle(i, umbral) for i in indices))
+
+    def detalle(self, indice, umbral=UMBRAL_Z_ANOMALIA):
+        motivos = []
+        for columna, sentido in self.COLUMNAS:
+            z = self.z[columna][indice]
+            if not sentido * z >= umbral:
+                continue
+            valor, media, percentil = getattr(self.historial, columna)[indice], self.media[columna][indice], self.percentil[columna][indice]
+            if columna == 'duracion':
+                motivos.append(f"Duración {valor / 60:.1f} min (media móvil {media / 60:.1f} min, p{PERCENTIL_REFERENCIA} {percentil / 60:.1f} min, z={z:+.1f})")
+            else:
+                motivos.append(f"Tamaño {valor:.2f} GB (media móvil {media:.2f} GB, p{PERCENTIL_REFERENCIA} {percentil:.2f} GB, z={z:+.1f})")
+        return "; ".join(motivos)
+
+
+def detectar_anomalias(historial):
+    """Anomalías de duración y tamaño del historial completo (RegistroAnomalias). Requiere numpy."""
+    with METRICAS.etapa('tendencias'):
+        return AnalisisTendencias(historial).anomalias()
+
+
+# --- Histórico de informes particionado por mes ---
+class HistoricoInformes:
+    """
+    Histórico local de las ejecuciones ya procesadas, sin duplicados, con una partición por mes
+    y un índice ('indice.json') de los informes compactados y los catálogos de cada mes.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORICO):
+        self.ruta = ruta
+        os.makedirs(ruta, exist_ok=True)
+        self.nuevas = defaultdict(list) # Mes -> (archivo, registro) con filas todavía sin escribir
+        self.indice = self.leer_indice()
+
+    def ruta_mes(self, mes):
+        return os.path.join(self.ruta, f"{mes}.particion")
+
+    def leer_indice(self):
+        try:
+            with open(os.path.join(self.ruta, 'indice.json'), encoding='utf-8') as f:
+                indice = json.load(f)
+            if indice.get('firma') == FIRMA_ENCABEZADOS:
+                return indice
+            logging.info("La tabla de encabezados cambió: se reconstruye el histórico de informes.")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.error(f"Índice del histórico ilegible ({e}); se reconstruye.")
+        return self.vaciar()
+
+    def guardar_indice(self):
+        ruta = os.path.join(self.ruta, 'indice.json')
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.indice, f, ensure_ascii=False)
+        os.replace(ruta + '.tmp', ruta)
+
+    def vaciar(self):
+        for nombre in os.listdir(self.ruta):
+            if nombre.endswith('.particion'):
+                os.remove(os.path.join(self.ruta, nombre))
+        self.nuevas.clear()
+        self.indice = {'firma': FIRMA_ENCABEZADOS, 'informes': {}, 'reconstruir': [], 'meses': {}}
+        return self.indice
+
+    def sincronizar(self, firmas):
+        """Vacía el histórico si algún informe compactado cambió o ya no está en 'firmas'. Devuelve True si se vació."""
+        informes = self.indice['informes']
+        if all(archivo in firmas and tuple(firma) == firmas[archivo] for archivo, firma in informes.items()):
+            return False
+        logging.info("Histórico: hay informes compactados que cambiaron o se eliminaron; se reconstruye.")
+        self.vaciar()
+        self.guardar_indice()
+        return True
+
+    def contiene(self, archivo, firma):
+        return tuple(self.indice['informes'].get(archivo, ())) == firma and archivo not in self.indice['reconstruir']
+
+    def por_reconstruir(self):
+        """True si hay informes que volver a compactar porque se descartó una partición suya."""
+        return bool(self.indice['reconstruir'])
+
+    def duplicados(self, archivo):
+        """Ejecuciones repetidas que aportó un informe al compactarse (sumadas en todos sus meses)."""
+        return sum(m['informes'].get(archivo, 0) for m in self.indice['meses'].values())
+
+    def es_mes_nuevo(self, mes):
+        """True si el mes no tiene filas en el histórico (ni pendientes de escribir)."""
+        return mes not in self.indice['meses'] and mes not in self.nuevas
+
+    @staticmethod
+    def filas_por_mes(registro):
+        """Índices de las filas del registro agrupados por mes de inicio ('AAAA-MM')."""
+        meses = {} # Día -> mes, para no formatear una fecha por fila
+        filas = defaultdict(list)
+        for i, inicio in enumerate(registro.inicio):
+            dia = inicio // SEGUNDOS_DIA
+            mes = meses.get(dia)
+            if mes is None:
+                mes = meses[dia] = desde_epoca(dia * SEGUNDOS_DIA).strftime('%Y-%m')
+            filas[mes].append(i)
+        return filas
+
+    def incorporar(self, archivo, firma, registro, por_mes=None):
+        """Reparte las filas de un informe entre sus meses; se escriben al llamar a guardar()."""
+        meses = self.indice['meses']
+        for mes, indices in (por_mes or self.filas_por_mes(registro)).items():
+            if archivo in meses.get(mes, {}).get('informes', {}):
+                continue # Ya está en ese mes: solo se reconstruye el mes descartado
+            self.nuevas[mes].append((archivo, registro.subconjunto(indices)))
+        self.indice['informes'][archivo] = list(firma)
+        if archivo in self.indice['reconstruir']:
+            self.indice['reconstruir'].remove(archivo)
+
+    def guardar(self):
+        """
+        Escribe las particiones que recibieron filas (sin duplicados y ordenadas por inicio) y el índice.
+        Cuenta por informe las ejecuciones (servidor, trabajo, inicio) que ya estaban en su mes, igual que
+        ClasificadorFallos, y las anota en METRICAS.
+        """
+        duplicados = Counter()
+        with METRICAS.etapa('historico_escritura'):
+            for mes, registros in self.nuevas.items():
+                particion = RegistroBackups()
+                if mes in self.indice['meses']:
+                    try:
+                        particion = self.leer_mes(mes)
+                    except ValueError: # Sus informes anteriores se vuelven a compactar en la próxima recarga
+                        self.descartar_mes(mes)
+                vistas = set(zip(particion.servidor, particion.trabajo, particion.inicio))
+                duplicados_mes = Counter()
+                for archivo, registro in registros:
+                    desde = len(particion)
+                    particion.extender(registro)
+                    duplicados_mes[archivo] += 0
+                    for clave in zip(particion.servidor[desde:], particion.trabajo[desde:], particion.inicio[desde:]):
+                        if clave in vistas:
+                            duplicados_mes[archivo] += 1
+                        else:
+                            vistas.add(clave)
+                self.escribir_mes(mes, particion.subconjunto(ejecuciones_unicas(particion)), duplicados_mes)
+                duplicados.update(duplicados_mes)
+            self.nuevas.clear()
+            self.guardar_indice()
+        for archivo, cantidad in duplicados.items():
+            if cantidad:
+                logging.info(f"Histórico: {archivo} aportó {cantidad} ejecuciones repetidas de informes anteriores o del mismo informe.")
+            METRICAS.anotar_archivo(archivo, 'duplicados', self.duplicados(archivo))
+
+    def escribir_mes(self, mes, particion, duplicados):
+        """Escribe la partición y su entrada del índice; 'duplicados' son los de cada informe recién añadido."""
+        ruta = self.ruta_mes(mes)
+        with open(ruta + '.tmp', 'wb') as f:
+            f.write(codificar_cache(particion.serializar()))
+        os.replace(ruta + '.tmp', ruta)
+        informes = self.indice['meses'].get(mes, {}).get('informes', {}) # Informe -> duplicados que aportó al mes
+        informes.update(duplicados)
+        dias = defaultdict(set)
+        for servidor, trabajo, inicio in zip(particion.servidor, particion.trabajo, particion.inicio):
+            dias[(servidor, trabajo)].add(inicio // SEGUNDOS_DIA)
+        self.indice['meses'][mes] = {
+            'filas': len(particion), 'desde': particion.inicio[0], 'hasta': particion.inicio[-1],
+            'claves': [[particion.servidores.valores[s], particion.trabajos.valores[t], sorted(d)] for (s, t), d in dias.items()],
+            'informes': informes}
+
+    def leer_mes(self, mes):
+        """Partición de un mes; ValueError si falta o está dañada (ver descartar_mes)."""
+        with METRICAS.etapa('historico_lectura'):
+            try:
+                with open(self.ruta_mes(mes), 'rb') as f:
+                    return RegistroBackups.deserializar(decodificar_cache(f.read()))
+            except (OSError, ValueError) as e:
+                raise ValueError(f"La partición {mes} del histórico no se puede leer: {e}")
+
+    def descartar_mes(self, mes):
+        """
+        Quita del índice un mes cuya partición no se puede leer y marca sus informes para volver a
+        compactarlos: la próxima recarga reconstruye ese mes (y solo ese) desde los informes.
+        """
+        logging.error(f"Histórico: la partición {mes} falta o está dañada; se reconstruye desde los informes.")
+        reconstruir = self.indice['reconstruir']
+        reconstruir.extend(archivo for archivo in self.indice['meses'].pop(mes, {}).get('informes', {}) if archivo not in reconstruir)
+        try:
+            os.remove(self.ruta_mes(mes))
+        except OSError:
+            pass
+        self.guardar_indice()
+
+    def meses(self):
+        return sorted(self.indice['meses'])
+
+    def claves_mes(self, mes):
+        """[servidor, trabajo, días] de un mes, para los catálogos de los filtros."""
+        return self.indice['meses'][mes]['claves']
+
+    def meses_recientes(self, dias):
+        """Meses con ejecuciones en los últimos 'dias' días de datos (contados desde la ejecución más reciente)."""
+        meses = self.indice['meses']
+        if not meses:
+            return []
+        limite = max(m['hasta'] for m in meses.values()) - dias * SEGUNDOS_DIA
+        return sorted(mes for mes, m in meses.items() if m['hasta'] >= limite)
+
+    def meses_en_rango(self, desde=None, hasta=None):
+        """Meses que se solapan con el rango de fechas (date, inclusive); sin límites, todos."""
+        minimo = a_epoca(datetime.combine(desde, time.min)) if desde else None
+        maximo = a_epoca(datetime.combine(hasta, time.max)) if hasta else None
+        return sorted(mes for mes, m in self.indice['meses'].items()
+                      if (minimo is None or m['hasta'] >= minimo) and (maximo is None or m['desde'] <= maximo))
+
+
+class VigilanteInformes:
+    """
+    Vigila la carpeta de informes en un hilo en segundo plano e incorpora los informes nuevos,
+    dejando cada actualización como (datos, motor) en la cola 'actualizaciones'.
+    """
+
+    def __init__(self, ruta_informes, procesos=PROCESOS_INGESTA, ruta_cache=RUTA_CACHE, intervalo=INTERVALO_VIGILANCIA,
+                 ruta_historico=RUTA_HISTORICO, dias_iniciales=DIAS_CARGA_INICIAL):
+        self.ruta_informes = ruta_informes
+        self.procesos = procesos
+        self.ruta_cache = ruta_cache
+        self.intervalo = intervalo
+        self.historico = HistoricoInformes(ruta_historico) if ruta_historico else None
+        self.dias_iniciales = dias_iniciales
+        self.meses_cargados = set() # Meses del histórico que ya están en el clasificador
+        self.ultimos = None # Últimos datos entregados, para descartar actualizaciones que quedaron atrás
+        self.version_historial = 0 # Sube cada vez que cambian las ejecuciones del historial (informes nuevos o recarga)
+        self.anomalias_calculadas = None # (versión del historial, RegistroAnomalias)
+        self.bloqueo = threading.RLock() # El hilo de vigilancia y las consultas comparten el clasificador
+        self.clasificador = ClasificadorFallos()
+        self.conocidos = {} # archivo -> (tamaño, mtime) con el que se incorporó
+        self.en_espera = {} # archivo -> (tamaño, mtime) visto en la pasada anterior, aún sin procesar
+        self.reintentos = Counter()
+        self.actualizaciones = queue.Queue()
+        self.detenido = threading.Event()
+        self.hilo = None
+
+    def escanear(self):
+        firmas = {}
+        with os.scandir(self.ruta_informes) as entradas:
+            for entrada in entradas:
+                if entrada.is_file() and es_informe(entrada.name):
+                    info = entrada.stat()
+                    firmas[entrada.path] = (info.st_size, info.st_mtime_ns)
+        return firmas
+
+    def ingerir(self, clasificador, archivos, firmas, podar):
+        """
+        Añade los archivos al clasificador (si no es None) y al histórico, y devuelve los que se pudieron leer.
+        Con histórico, al clasificador solo llegan las filas de los meses cargados (o de meses nuevos).
+        """
+        leidos = set()
+        for archivo, datos in leer_archivos_con_cache(sorted(archivos), self.procesos, self.ruta_cache, podar):
+            if datos is None:
+                self.reintentos[archivo] += 1
+                if self.reintentos[archivo] >= MAX_REINTENTOS_INFORME:
+                    # Se deja de reintentar hasta que el archivo vuelva a cambiar
+                    logging.error(f"No se pudo leer {archivo} tras {self.reintentos[archivo]} intentos; se esperará a que cambie.")
+                    self.conocidos[archivo] = firmas[archivo]
+                    del self.reintentos[archivo]
+                continue
+            registro = RegistroBackups.deserializar(datos)
+            if self.historico:
+                # Un mes que aún no está en el histórico llega completo con los informes nuevos
+                por_mes = self.historico.filas_por_mes(registro)
+                self.meses_cargados.update(mes for mes in por_mes if self.historico.es_mes_nuevo(mes))
+                self.historico.incorporar(archivo, firmas[archivo], registro, por_mes)
+                if clasificador is not None:
+                    registro = registro.subconjunto(sorted(i for mes, indices in por_mes.items() if mes in self.meses_cargados for i in indices))
+            if clasificador is not None:
+                clasificador.agregar(registro, archivo)
+            self.reintentos.pop(archivo, None)
+            leidos.add(archivo)
+        if self.historico:
+            self.historico.guardar()
+        if leidos:
+            self.version_historial += 1
+        return leidos
+
+    def cargar(self):
+        """Carga completa de la carpeta. Devuelve los datos en el formato de analizar_informes."""
+        METRICAS.reiniciar()
+        return self.recargar(self.escanear(), podar=True)
+
+    def recargar(self, firmas, podar):
+        with self.bloqueo:
+            self.version_historial += 1 # Pudo desaparecer o cambiar algún informe
+            clasificador = ClasificadorFallos()
+            self.conocidos = {}
+            if self.historico is None:
+                leidos = self.ingerir(clasificador, firmas, firmas, podar)
+            else:
+                # Se compactan en el histórico los informes que falten y solo se cargan los meses recientes
+                reconstruido = self.historico.sincronizar(firmas)
+                for intento in range(2): # Si una partición está dañada, se descarta y se reconstruye en la segunda vuelta
+                    nuevos = [archivo for archivo, firma in firmas.items() if not self.historico.contiene(archivo, firma)]
+                    leidos = self.ingerir(None, nuevos, firmas, podar and reconstruido) | (firmas.keys() - set(nuevos))
+                    for archivo in firmas.keys() - set(nuevos): # Compactados en ejecuciones anteriores
+                        METRICAS.registrar_archivo(archivo, {'origen': 'historico', 'duplicados': self.historico.duplicados(archivo)})
+                    self.meses_cargados = set(self.historico.meses_recientes(self.dias_iniciales))
+                    clasificador = ClasificadorFallos()
+                    try:
+                        for mes in self.meses_cargados:
+                            clasificador.agregar(self.leer_mes(mes))
+                        break
+                    except ValueError:
+                        if intento:
+                            raise
+                logging.info(f"Histórico: {len(self.meses_cargados)} de {len(self.historico.meses())} meses cargados al iniciar.")
+            self.clasificador = clasificador
+            self.conocidos.update((archivo, firmas[archivo]) for archivo in leidos)
+            return self.datos()
+
+    def datos(self):
+        with self.bloqueo:
+            if self.historico:
+                for mes in self.historico.meses():
+                    if mes not in self.meses_cargados:
+                        self.clasificador.agregar_dias(self.historico.claves_mes(mes))
+            datos = self.ultimos = (self.clasificador.fallas_reales(),) + self.clasificador.catalogos()
+        METRICAS.guardar()
+        return datos
+
+    def es_vigente(self, datos):
+        """False si después de estos datos ya se entregaron otros más recientes (p. ej. al cargar un mes)."""
+        return datos is self.ultimos
+
+    def historial_completo(self):
+        """
+        Todas las ejecuciones (también las exitosas): las particiones del histórico o, sin él, la carpeta.
+        Se leen sin tomar el bloqueo (las particiones se reemplazan de forma atómica), para no frenar a la
+        vigilancia ni a las consultas que cargan meses mientras tanto.
+        """
+        if self.historico is None:
+            return historial_completo(self.ruta_informes, self.procesos, self.ruta_cache)
+        for intento in range(2):
+            with self.bloqueo:
+                meses = self.historico.meses()
+            historial = RegistroBackups()
+            try:
+                for mes in meses: # Los meses no se solapan y ya vienen sin duplicados
+                    historial.extender(self.leer_mes(mes))
+                return historial
+            except ValueError:
+                if intento:
+                    raise
+                self.reparar_historico()
+
+    def leer_mes(self, mes):
+        """Partición de un mes del histórico; si está dañada, se descarta (ver HistoricoInformes.descartar_mes)."""
+        try:
+            return self.historico.leer_mes(mes)
+        except ValueError:
+            with self.bloqueo:
+                self.historico.descartar_mes(mes)
+                self.meses_cargados.discard(mes)
+            raise
+
+    def reparar_historico(self):
+        """Vuelve a compactar los meses descartados y deja los datos recargados en 'actualizaciones'."""
+        with self.bloqueo:
+            datos = self.recargar(dict(self.conocidos), podar=False)
+        self.actualizaciones.put((datos, MotorConsultas(datos[0])))
+        return datos
+
+    def anomalias(self):
+        """
+        Anomalías de tendencia del historial completo (RegistroAnomalias). Se calculan solo cuando se piden
+        y se guardan por versión del historial: mientras no lleguen informes nuevos no se vuelve a leer nada.
+        """
+        version = self.version_historial
+        calculadas = self.anomalias_calculadas
+        if calculadas is not None and calculadas[0] == version:
+            return calculadas[1]
+        anomalias = detectar_anomalias(self.historial_completo())
+        # Si el historial cambió mientras se calculaban, quedan con la versión anterior y se recalculan al pedirlas
+        self.anomalias_calculadas = (version, anomalias)
+        return anomalias
+
+    def asegurar_periodo(self, desde=None, hasta=None):
+        """
+        Carga del histórico los meses del rango (date, inclusive; sin límites, todo el historial) que aún
+        no estén en memoria. Devuelve los datos actualizados, o None si ya estaban todos.
+        """
+        if self.historico is None:
+            return None
+        with self.bloqueo:
+            for intento in range(2): # Si un mes está dañado, se reconstruye y se vuelve a pedir el rango
+                faltantes = [mes for mes in self.historico.meses_en_rango(desde, hasta) if mes not in self.meses_cargados]
+                if not faltantes:
+                    return self.ultimos if intento else None
+                logging.info(f"Histórico: cargando {len(faltantes)} meses más ({faltantes[0]} a {faltantes[-1]}).")
+                try:
+                    for mes in faltantes:
+                        self.clasificador.agregar(self.leer_mes(mes))
+                        self.meses_cargados.add(mes)
+                    return self.datos()
+                except ValueError:
+                    if intento:
+                        raise
+                    self.reparar_historico()
+
+    def revisar(self):
+        """Una pasada de vigilancia. Devuelve los datos actualizados, o None si no hubo cambios."""
+        with self.bloqueo:
+            return self.revisar_cambios()
+
+    def revisar_cambios(self):
+        firmas = self.escanear()
+        listos = []
+        for archivo, firma in firmas.items():
+            if self.conocidos.get(archivo) == firma:
+                continue
+            if self.en_espera.get(archivo) != firma: # Todavía se está escribiendo (o se acaba de ver)
+                self.en_espera[archivo] = firma
+                continue
+            listos.append(archivo)
+        eliminados = [archivo for archivo in self.conocidos if archivo not in firmas]
+        if self.historico and self.historico.por_reconstruir(): # Se descartó una partición dañada
+            return self.recargar({a: f for a, f in firmas.items() if a not in self.en_espera}, podar=False)
+        if not listos and not eliminados:
+            return None
+
+        for archivo in listos:
+            del self.en_espera[archivo]
+        modificados = [archivo for archivo in listos if archivo in self.conocidos]
+        if eliminados or modificados:
+            logging.info(f"Vigilancia: {len(modificados)} informes modificados y {len(eliminados)} eliminados; se recarga la carpeta.")
+            estables = {a: f for a, f in firmas.items() if a not in self.en_espera}
+            return self.recargar(estables, podar=False)
+
+        logging.info(f"Vigilancia: {len(listos)} informes nuevos.")
+        leidos = self.ingerir(self.clasificador, listos, firmas, podar=False)
+        self.conocidos.update((archivo, firmas[archivo]) for archivo in leidos)
+        return self.datos() if leidos else None
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.bucle, name="VigilanteInformes", daemon=True)
+        self.hilo.start()
+
+    def detener(self):
+        self.detenido.set()
+
+    def bucle(self):
+        while not self.detenido.wait(self.intervalo):
+            try:
+                datos = self.revisar()
+                if datos is not None:
+                    # El motor de consultas también se construye aquí, fuera del hilo de la interfaz
+                    self.actualizaciones.put((datos, MotorConsultas(datos[0])))
+            except Exception as e:
+                logging.error(f"Error vigilando la carpeta de informes {self.ruta_informes}: {e}")
+
+
+# --- Exportación de informes ---
+ENCABEZADOS_EXPORTACION = ["Servidor", "Nombre Trabajo", "Inicio", "Fin", "Tamaño Backup (GB)", "Estado"]
+ENCABEZADO_DETALLE = "Detalle" # Columna extra al exportar anomalías (motivo de cada una)
+COLORES_ESTADO = {
+    "success": "C6EFCE", # Mantener por consistencia, aunque no se esperan aquí
+    "failed": "FFC7CE",
+    "warning": "FFEB9C"
+}
+FORMATOS_EXPORTACION = ('xlsx', 'csv', 'parquet')
+TAMANO_LOTE_PARQUET = 50000 # Filas por grupo al escribir Parquet
+
+
+def ruta_exportacion(extension):
     if not os.path.exists(RUTA_EXPORTACION):
         os.makedirs(RUTA_EXPORTACION)
-
     fecha_actual = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    ruta_archivo = os.path.join(RUTA_EXPORTACION, f"InformeGenerado_{fecha_actual}.xlsx")
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Auditoría Fallas"
-    ws.append(["Servidor", "Nombre Trabajo", "Inicio", "Fin", "Tamaño Backup (GB)", "Estado"])
+    return os.path.join(RUTA_EXPORTACION, f"InformeGenerado_{fecha_actual}.{extension}")
 
-    colores = {
-        "success": "C6EFCE", # Mantener por consistencia, aunque no se esperan aquí
-        "failed": "FFC7CE",
-        "warning": "FFEB9C"
-    }
 
-    resumen_estado = Counter()
+def fallas_unicas_por_dia(resultados):
+    """Última falla de cada (servidor, trabajo, día). Guarda una fila por clave, no todas las recibidas."""
     fallas_por_dia_servidor_trabajo = {}
     for r in resultados:
         clave_diaria = (r['servidor'], r['nombre_trabajo'], r['inicio'].date())
         # Guarda solo la última ocurrencia del día si hay varias, o la primera si es la única
         if clave_diaria not in fallas_por_dia_servidor_trabajo or r['inicio'] > fallas_por_dia_servidor_trabajo[clave_diaria]['inicio']:
             fallas_por_dia_servidor_trabajo[clave_diaria] = r
+    return fallas_por_dia_servidor_trabajo.values()
+
+
+def exportar_excel(resultados, ruta_archivo=None, agrupar_por_dia=True, con_detalle=False):
+    """
+    Exporta las fallas a Excel en modo de solo escritura: las filas se vuelcan al archivo a medida que
+    llegan y los rellenos de color se crean una vez por estado, así la memoria no crece con el informe.
+    'resultados' puede ser cualquier iterable de intentos (p. ej. un generador sobre una consulta).
+    Con agrupar_por_dia=False se exportan tal cual (útil si ya vienen del resumen diario del motor).
+    Con con_detalle=True se agrega la columna "Detalle" (intentos de un RegistroAnomalias).
+    Devuelve (ruta del archivo, filas exportadas).
+    """
+    ruta_archivo = ruta_archivo or ruta_exportacion('xlsx')
+    if agrupar_por_dia:
+        resultados = fallas_unicas_por_dia(resultados)
 
-    for r in fallas_por_dia_servidor_trabajo.values():
-        fila = [
-            r['servidor'], r['nombre_trabajo'],
-            r['inicio'].strftime(CONFIGURACION_FECHA_HORA),
-            r['fin'].strftime(CONFIGURACION_FECHA_HORA),
-            r['tamano_backup'], r['estado']
-        ]
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Auditoría Fallas")
+    ws.append(ENCABEZADOS_EXPORTACION + [ENCABEZADO_DETALLE] if con_detalle else ENCABEZADOS_EXPORTACION)
+
+    # Un solo PatternFill por estado, compartido por todas las celdas de ese color
+    rellenos = {estado: PatternFill(start_color=color, end_color=color, fill_type="solid") for estado, color in COLORES_ESTADO.items()}
+    relleno_otro = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
+
+    resumen_estado = Counter()
+    for r in resultados:
+        relleno = rellenos.get(r['estado'], relleno_otro)
+        fila = []
+        valores = (r['servidor'], r['nombre_trabajo'],
+                   r['inicio'].strftime(CONFIGURACION_FECHA_HORA),
+                   r['fin'].strftime(CONFIGURACION_FECHA_HORA),
+                   r['tamano_backup'], r['estado'])
+        if con_detalle:
+            valores += (r['detalle'],)
+        for valor in valores:
+            celda = WriteOnlyCell(ws, value=valor)
+            celda.fill = relleno
+            fila.append(celda)
         ws.append(fila)
         resumen_estado[r['estado']] += 1
-        color = colores.get(r['estado'], "FFFFFF")
-        for col in range(1, len(fila) + 1):
-            ws.cell(row=ws.max_row, column=col).fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
 
     ws_resumen = wb.create_sheet(title="Resumen Fallas")
     ws_resumen.append(["Estado", "Cantidad"])
@@ -195,9 +1994,730 @@ def exportar_excel(resultados):
 
     wb.save(ruta_archivo)
     print(f"Informe de Fallas exportado en: {ruta_archivo}")
+    return ruta_archivo, sum(resumen_estado.values())
+
+
+def exportar_csv(resultados, ruta_archivo=None, agrupar_por_dia=True, con_detalle=False):
+    """Igual que exportar_excel, pero en CSV (UTF-8 con BOM para que Excel respete los acentos)."""
+    ruta_archivo = ruta_archivo or ruta_exportacion('csv')
+    if agrupar_por_dia:
+        resultados = fallas_unicas_por_dia(resultados)
+
+    cantidad = 0
+    with open(ruta_archivo, 'w', newline='', encoding='utf-8-sig') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(ENCABEZADOS_EXPORTACION + [ENCABEZADO_DETALLE] if con_detalle else ENCABEZADOS_EXPORTACION)
+        for r in resultados:
+            fila = [r['servidor'], r['nombre_trabajo'],
+                    r['inicio'].strftime(CONFIGURACION_FECHA_HORA),
+                    r['fin'].strftime(CONFIGURACION_FECHA_HORA),
+                    '' if r['tamano_backup'] is None else r['tamano_backup'], r['estado']]
+            if con_detalle:
+                fila.append(r['detalle'])
+            escritor.writerow(fila)
+            cantidad += 1
+
+    print(f"Informe de Fallas exportado en: {ruta_archivo}")
+    return ruta_archivo, cantidad
+
+
+def exportar_parquet(resultados, ruta_archivo=None, agrupar_por_dia=True, con_detalle=False):
+    """
+    Igual que exportar_excel, pero en Parquet, por lotes de TAMANO_LOTE_PARQUET filas.
+    Inicio y fin se guardan como timestamps. Requiere pyarrow (dependencia opcional).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("La exportación a Parquet necesita el paquete 'pyarrow' (pip install pyarrow).")
+
+    ruta_archivo = ruta_archivo or ruta_exportacion('parquet')
+    if agrupar_por_dia:
+        resultados = fallas_unicas_por_dia(resultados)
+
+    campos = ['servidor', 'nombre_trabajo', 'inicio', 'fin', 'tamano_backup', 'estado']
+    esquema = [('servidor', pa.string()), ('nombre_trabajo', pa.string()),
+               ('inicio', pa.timestamp('s')), ('fin', pa.timestamp('s')),
+               ('tamano_backup_gb', pa.float64()), ('estado', pa.string())]
+    if con_detalle:
+        campos.append('detalle')
+        esquema.append(('detalle', pa.string()))
+    esquema = pa.schema(esquema)
+    cantidad = 0
+    with pq.ParquetWriter(ruta_archivo, esquema) as escritor:
+        resultados = iter(resultados)
+        while True:
+            lote = list(islice(resultados, TAMANO_LOTE_PARQUET))
+            if not lote:
+                break
+            columnas = [[r[campo] for r in lote] for campo in campos]
+            escritor.write_table(pa.Table.from_arrays(columnas, schema=esquema))
+            cantidad += len(lote)
+
+    print(f"Informe de Fallas exportado en: {ruta_archivo}")
+    return ruta_archivo, cantidad
+
+
+def exportar_informe(resultados, formato='xlsx', ruta_archivo=None, agrupar_por_dia=True, con_detalle=False):
+    """Exporta en el formato indicado ('xlsx', 'csv' o 'parquet'). Devuelve (ruta, filas exportadas)."""
+    exportadores = {'xlsx': exportar_excel, 'csv': exportar_csv, 'parquet': exportar_parquet}
+    if formato not in exportadores:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    with METRICAS.etapa('exportacion'):
+        return exportadores[formato](resultados, ruta_archivo, agrupar_por_dia, con_detalle)
+
+
+# --- Servicio de consultas (HTTP/JSON local) ---
+HOST_SERVICIO = "127.0.0.1"
+PUERTO_SERVICIO = 8765
+TAMANO_PAGINA = 500 # Filas por página de /consulta si no se indica 'tamano'
+TAMANO_PAGINA_MAXIMO = 10000
+FILAS_POR_FRAGMENTO = 500 # Filas que se serializan y envían en cada fragmento de la respuesta
+
+
+def fila_json(registro, indice):
+    """Una fila del registro como diccionario apto para JSON (fechas ISO, None en lugar de NaN)."""
+    fila = {campo: registro.valor(indice, campo) for campo in CAMPOS_INTENTO}
+    fila['inicio'] = fila['inicio'].isoformat(sep=' ')
+    fila['fin'] = fila['fin'].isoformat(sep=' ')
+    return fila
+
+
+def registro_a_json(registro):
+    """RegistroBackups como diccionario JSON: tablas de códigos y columnas como listas (NaN como None)."""
+    columnas = {}
+    for columna in COLUMNAS_REGISTRO:
+        valores = getattr(registro, columna)
+        columnas[columna] = [None if isnan(v) else v for v in valores] if valores.typecode == 'd' else valores.tolist()
+    return {'servidores': registro.servidores.valores, 'trabajos': registro.trabajos.valores,
+            'estados': registro.estados.valores, 'columnas': columnas}
+
+
+def registro_desde_json(datos, clase=RegistroBackups):
+    registro = clase()
+    registro.servidores = TablaCodigos(datos['servidores'])
+    registro.trabajos = TablaCodigos(datos['trabajos'])
+    registro.estados = TablaCodigos(datos['estados'])
+    for columna in COLUMNAS_REGISTRO:
+        typecode = getattr(registro, columna).typecode
+        valores = datos['columnas'][columna]
+        setattr(registro, columna, array(typecode, [nan if v is None else v for v in valores] if typecode == 'd' else valores))
+    if 'detalles' in datos:
+        registro.detalles = datos['detalles']
+    return registro
+
+
+def datos_a_json(datos):
+    """Datos en el formato de analizar_informes, como diccionario JSON (conjuntos y fechas como listas)."""
+    registro, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo = datos
+    return {'registro': registro_a_json(registro),
+            'trabajos_por_servidor': {servidor: sorted(t) for servidor, t in trabajos_por_servidor.items()},
+            'trabajos': trabajos, 'servidores': servidores,
+            'fechas': [fecha.isoformat() for fecha in fechas],
+            'fechas_por_servidor_y_trabajo': [[servidor, trabajo, sorted(f.isoformat() for f in dias)]
+                                              for (servidor, trabajo), dias in fechas_por_servidor_y_trabajo.items()]}
+
+
+def datos_desde_json(contenido):
+    trabajos_por_servidor = defaultdict(set, {servidor: set(t) for servidor, t in contenido['trabajos_por_servidor'].items()})
+    fechas_por_servidor_y_trabajo = defaultdict(set)
+    for servidor, trabajo, dias in contenido['fechas_por_servidor_y_trabajo']:
+        fechas_por_servidor_y_trabajo[(servidor, trabajo)] = {date.fromisoformat(dia) for dia in dias}
+    return (registro_desde_json(contenido['registro']), trabajos_por_servidor, contenido['trabajos'],
+            contenido['servidores'], [date.fromisoformat(fecha) for fecha in contenido['fechas']], fechas_por_servidor_y_trabajo)
+
+
+def leer_filtros(parametros):
+    """Filtros de una consulta (los mismos de la interfaz), validados. Lanza ValueError si alguno es inválido."""
+    fecha = parametros.get('fecha', '')
+    if fecha:
+        date.fromisoformat(fecha)
+    desde = date.fromisoformat(parametros['desde']) if parametros.get('desde') else None
+    hasta = date.fromisoformat(parametros['hasta']) if parametros.get('hasta') else None
+    return (parametros.get('servidor', ''), parametros.get('trabajo', ''), fecha,
+            parametros.get('estado', '').lower(), desde, hasta)
+
+
+class ServicioConsultas:
+    """
+    Servicio HTTP/JSON local (/estado, /consulta, /anomalias y /datos) para que varios analistas
+    compartan una sola carga de los informes.
+    """
+
+    def __init__(self, ruta_informes=RUTA_INFORMES, procesos=PROCESOS_INGESTA, ruta_cache=RUTA_CACHE, vigilar=VIGILAR_INFORMES):
+        self.vigilante = VigilanteInformes(ruta_informes, procesos, ruta_cache)
+        self.vigilar = vigilar
+        self.datos = None
+        self.motor = None
+        self.version = 0
+        self.cache_datos = None # (versión, cuerpo JSON de /datos)
+        self.cache_anomalias = None # (versión del historial, cuerpo JSON de /anomalias)
+        self.calculo_anomalias = asyncio.Lock()
+        self.ejecutor = ThreadPoolExecutor(max_workers=1) # Un solo hilo: MotorConsultas no es seguro entre hilos
+
+    def aplicar(self, datos, motor):
+        self.datos, self.motor = datos, motor
+        self.version += 1
+        logging.info(f"Servicio de consultas: datos versión {self.version} ({len(datos[0])} fallas reales).")
+
+    async def cargar(self):
+        loop = asyncio.get_running_loop()
+        try:
+            datos = await loop.run_in_executor(self.ejecutor, self.vigilante.cargar)
+            self.aplicar(datos, await loop.run_in_executor(self.ejecutor, MotorConsultas, datos[0]))
+        except Exception as e:
+            logging.error(f"El servicio de consultas no pudo cargar los informes de {self.vigilante.ruta_informes}: {e}")
+            print(f"ERROR: No se pudieron cargar los informes: {e}")
+            return
+        if self.vigilar:
+            self.vigilante.iniciar()
+            while True:
+                await asyncio.sleep(1)
+                try:
+                    while True:
+                        datos, motor = self.vigilante.actualizaciones.get_nowait()
+                        if self.vigilante.es_vigente(datos):
+                            self.aplicar(datos, motor)
+                except queue.Empty:
+                    pass
+
+    async def asegurar_periodo(self, desde, hasta):
+        """Carga del histórico los meses del rango que falten y publica los datos resultantes."""
+        loop = asyncio.get_running_loop()
+        datos = await loop.run_in_executor(self.ejecutor, self.vigilante.asegurar_periodo, desde, hasta)
+        if datos is not None:
+            self.aplicar(datos, await loop.run_in_executor(self.ejecutor, MotorConsultas, datos[0]))
+
+    async def servir(self, host=HOST_SERVICIO, puerto=PUERTO_SERVICIO):
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        logging.info(f"Servicio de consultas escuchando en http://{host}:{puerto}")
+        print(f"Servicio de consultas en http://{host}:{puerto} (Ctrl+C para detenerlo)")
+        carga = asyncio.create_task(self.cargar())
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            carga.cancel()
+            self.vigilante.detener()
+            self.ejecutor.shutdown(wait=False, cancel_futures=True)
+
+    async def atender(self, reader, writer):
+        try:
+            linea = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''): # Los encabezados no se usan
+                pass
+            if len(linea) < 2:
+                return
+            if linea[0] != 'GET':
+                await self.responder(writer, 405, {'error': "Solo se admite GET."})
+                return
+            destino = urllib.parse.urlsplit(linea[1])
+            parametros = {clave: valores[-1] for clave, valores in urllib.parse.parse_qs(destino.query).items()}
+            if destino.path == '/estado':
+                await self.responder(writer, 200, {'version': self.version, 'cargado': self.datos is not None,
+                                                   'fallas': len(self.datos[0]) if self.datos else 0,
+                                                   'servidores': len(self.datos[3]) if self.datos else 0})
+            elif destino.path not in ('/consulta', '/datos', '/anomalias'):
+                await self.responder(writer, 404, {'error': f"Ruta desconocida: {destino.path}"})
+            elif self.datos is None:
+                await self.responder(writer, 503, {'error': "Los informes todavía se están cargando."})
+            elif destino.path == '/datos':
+                await self.responder_datos(writer, parametros)
+            elif destino.path == '/anomalias':
+                await self.responder_anomalias(writer)
+            else:
+                await self.responder_consulta(writer, parametros)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # El cliente cerró la conexión
+        except Exception as e:
+            logging.error(f"Error atendiendo una petición del servicio de consultas: {e}")
+        finally:
+            writer.close()
+
+    def enviar_encabezado(self, writer, codigo):
+        textos = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+        writer.write(f"HTTP/1.1 {codigo} {textos[codigo]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     "Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode('latin-1'))
+
+    async def enviar_fragmento(self, writer, texto):
+        contenido = texto.encode('utf-8')
+        if contenido:
+            writer.write(f"{len(contenido):X}\r\n".encode('latin-1') + contenido + b"\r\n")
+            await writer.drain() # Espera a que el cliente lea antes de seguir (control de flujo)
+
+    async def terminar_respuesta(self, writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def responder(self, writer, codigo, contenido):
+        self.enviar_encabezado(writer, codigo)
+        await self.enviar_fragmento(writer, json.dumps(contenido, ensure_ascii=False))
+        await self.terminar_respuesta(writer)
+
+    async def responder_datos(self, writer, parametros):
+        # Con desde/hasta (o historial=1, todo) se cargan antes los meses del histórico que falten; si el
+        # cliente indica la versión que ya tiene y no cambió, no se reenvían los datos
+        try:
+            desde = date.fromisoformat(parametros['desde']) if parametros.get('desde') else None
+            hasta = date.fromisoformat(parametros['hasta']) if parametros.get('hasta') else None
+        except ValueError as e:
+            await self.responder(writer, 400, {'error': str(e)})
+            return
+        if desde or hasta or parametros.get('historial'):
+            await self.asegurar_periodo(desde, hasta)
+        if parametros.get('version') == str(self.version):
+            await self.responder(writer, 200, {'version': self.version, 'sin_cambios': True})
+            return
+
+        version = self.version
+        if not self.cache_datos or self.cache_datos[0] != version:
+            datos = self.datos
+            cuerpo = await asyncio.get_running_loop().run_in_executor(
+                self.ejecutor, lambda: json.dumps(dict(datos_a_json(datos), version=version), ensure_ascii=False))
+            self.cache_datos = (version, cuerpo)
+        cuerpo = self.cache_datos[1]
+        self.enviar_encabezado(writer, 200)
+        for inicio in range(0, len(cuerpo), 1024 * 1024):
+            await self.enviar_fragmento(writer, cuerpo[inicio:inicio + 1024 * 1024])
+        await self.terminar_respuesta(writer)
+
+    async def responder_anomalias(self, writer):
+        # Se calculan al pedirlas y se guardan por versión del historial (los meses cargados no las cambian).
+        # Van en el ejecutor por defecto, no en el de las consultas, para no demorarlas mientras tanto
+        async with self.calculo_anomalias: # Peticiones simultáneas esperan al mismo cálculo
+            version = self.vigilante.version_historial
+            if not self.cache_anomalias or self.cache_anomalias[0] != version:
+                def calcular():
+                    anomalias = self.vigilante.anomalias()
+                    return json.dumps(dict(registro_a_json(anomalias), detalles=anomalias.detalles, version=version), ensure_ascii=False)
+                try:
+                    cuerpo = await asyncio.get_running_loop().run_in_executor(None, calcular)
+                except RuntimeError as e: # Falta numpy en el servidor
+                    await self.responder(writer, 503, {'error': str(e)})
+                    return
+                self.cache_anomalias = (version, cuerpo)
+            cuerpo = self.cache_anomalias[1]
+        self.enviar_encabezado(writer, 200)
+        await self.enviar_fragmento(writer, cuerpo)
+        await self.terminar_respuesta(writer)
+
+    async def responder_consulta(self, writer, parametros):
+        try:
+            filtros = leer_filtros(parametros)
+            vista = parametros.get('vista', 'intentos')
+            if vista not in ('intentos', 'resumen'):
+                raise ValueError("'vista' debe ser 'intentos' o 'resumen'.")
+            pagina = max(1, int(parametros.get('pagina', 1)))
+            tamano = min(TAMANO_PAGINA_MAXIMO, max(1, int(parametros.get('tamano', TAMANO_PAGINA))))
+        except ValueError as e:
+            await self.responder(writer, 400, {'error': str(e)})
+            return
+
+        # Solo se leen del histórico los meses del día o del rango pedidos (sin fechas, todo el historial)
+        fecha, desde, hasta = filtros[2], filtros[4], filtros[5]
+        if fecha:
+            desde = hasta = date.fromisoformat(fecha)
+        await self.asegurar_periodo(desde, hasta)
+        loop = asyncio.get_running_loop()
+        registro, motor, version = self.datos[0], self.motor, self.version
+        consulta = motor.resumen_diario if vista == 'resumen' else motor.consultar
+        indices = await loop.run_in_executor(self.ejecutor, consulta, *filtros)
+        pagina_indices = indices[(pagina - 1) * tamano:pagina * tamano]
+
+        self.enviar_encabezado(writer, 200)
+        await self.enviar_fragmento(writer, json.dumps({'version': version, 'total': len(indices), 'pagina': pagina,
+                                                        'tamano': tamano, 'vista': vista})[:-1] + ', "filas": [')
+        for inicio in range(0, len(pagina_indices), FILAS_POR_FRAGMENTO):
+            fragmento = ", ".join(json.dumps(fila_json(registro, i), ensure_ascii=False)
+                                  for i in pagina_indices[inicio:inicio + FILAS_POR_FRAGMENTO])
+            await self.enviar_fragmento(writer, (", " if inicio else "") + fragmento)
+        await self.enviar_fragmento(writer, "]}")
+        await self.terminar_respuesta(writer)
+
+
+class ClienteServicio:
+    """
+    Cliente de ServicioConsultas con la misma interfaz que VigilanteInformes. Descarga las fallas por
+    /datos y filtra en local; /consulta queda para clientes que no cargan los datos.
+    """
+
+    def __init__(self, url, intervalo=INTERVALO_VIGILANCIA):
+        self.url = url.rstrip('/')
+        self.intervalo = intervalo
+        self.version = None
+        self.ultimos = None
+        self.actualizaciones = queue.Queue()
+        self.detenido = threading.Event()
+        self.hilo = None
+
+    def pedir(self, ruta, **parametros):
+        consulta = urllib.parse.urlencode({clave: valor for clave, valor in parametros.items() if valor not in (None, '')})
+        with urllib.request.urlopen(f"{self.url}{ruta}" + (f"?{consulta}" if consulta else ""), timeout=300) as respuesta:
+            return json.load(respuesta)
+
+    def cargar(self, **parametros):
+        contenido = self.pedir('/datos', **parametros)
+        if contenido.get('sin_cambios'):
+            return None
+        self.version = contenido['version']
+        self.ultimos = datos_desde_json(contenido)
+        return self.ultimos
+
+    def es_vigente(self, datos):
+        return datos is self.ultimos
+
+    def anomalias(self):
+        """Anomalías calculadas por el servicio (así el cliente no necesita el historial completo ni numpy)."""
+        return registro_desde_json(self.pedir('/anomalias'), RegistroAnomalias)
+
+    def asegurar_periodo(self, desde=None, hasta=None):
+        """Pide al servicio los meses del rango (sin límites, todo el historial). Devuelve los datos nuevos o None."""
+        return self.cargar(desde=desde and str(desde), hasta=hasta and str(hasta),
+                           historial=None if desde or hasta else 1, version=self.version)
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.bucle, name="ClienteServicio", daemon=True)
+        self.hilo.start()
+
+    def detener(self):
+        self.detenido.set()
+
+    def bucle(self):
+        while not self.detenido.wait(self.intervalo):
+            try:
+                if self.pedir('/estado')['version'] != self.version:
+                    datos = self.cargar()
+                    self.actualizaciones.put((datos, MotorConsultas(datos[0])))
+            except Exception as e:
+                logging.error(f"Error consultando el servicio {self.url}: {e}")
+
+
+# --- Modo por lotes (sin interfaz) ---
+# Códigos de salida del modo por lotes
+SALIDA_OK = 0
+SALIDA_ERRORES_EXPORTACION = 1 # Alguna exportación falló (las demás sí se generaron)
+SALIDA_ESPECIFICACION_INVALIDA = 2
+SALIDA_SIN_DATOS = 3 # No se encontraron datos válidos en los informes
+SALIDA_ERROR_INESPERADO = 4 # Falló la carga por un error no previsto (ver 'error' en el resumen y el log)
+FILTROS_LOTE = ('servidor', 'trabajo', 'fecha', 'estado', 'desde', 'hasta')
+
+
+def leer_especificacion(ruta_especificacion):
+    """
+    Lee y valida el archivo JSON del modo por lotes. Ejemplo:
+    {"informes": "InformesSinProcesar", "salida": "InformesExportados", "formato": "xlsx",
+     "exportaciones": [{"nombre": "fallas_por_servidor", "por": "servidor"},
+                       {"nombre": "septiembre", "desde": "2026-09-01", "hasta": "2026-09-30", "formato": "csv"}]}
+    Cada exportación admite los filtros de la interfaz (servidor, trabajo, fecha, estado), un rango
+    desde/hasta, "por" ("servidor" o "trabajo") para generar un archivo por valor, "detalle": true para
+    exportar todos los intentos en lugar del resumen diario, "anomalias": true para exportar las anomalías
+    de duración y tamaño (con la columna "Detalle") en lugar de las fallas, y "formato" propio.
+    Cualquier error de forma o de tipos se informa como ValueError (especificación inválida).
+    """
+    with open(ruta_especificacion, encoding='utf-8') as f:
+        especificacion = json.load(f)
+    if not isinstance(especificacion, dict):
+        raise ValueError("La especificación debe ser un objeto JSON.")
+    for campo in ('informes', 'salida', 'formato'):
+        if not isinstance(especificacion.get(campo, ''), str):
+            raise ValueError(f"'{campo}' debe ser un texto.")
+    exportaciones = especificacion.get('exportaciones')
+    if not isinstance(exportaciones, list) or not exportaciones:
+        raise ValueError("La especificación debe incluir una lista 'exportaciones' no vacía.")
+    for n, exportacion in enumerate(exportaciones, start=1):
+        if not isinstance(exportacion, dict):
+            raise ValueError(f"La exportación {n} debe ser un objeto JSON.")
+        nombre = exportacion.setdefault('nombre', f"exportacion_{n}")
+        if not isinstance(nombre, str) or not nombre:
+            raise ValueError(f"Exportación {n}: 'nombre' debe ser un texto no vacío.")
+        formato = exportacion.setdefault('formato', especificacion.get('formato', 'xlsx'))
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Exportación '{nombre}': formato no soportado '{formato}'.")
+        if exportacion.get('por') not in (None, 'servidor', 'trabajo'):
+            raise ValueError(f"Exportación '{nombre}': 'por' debe ser 'servidor' o 'trabajo'.")
+        for campo in ('servidor', 'trabajo', 'estado', 'fecha', 'desde', 'hasta'):
+            if not isinstance(exportacion.get(campo, ''), (str, type(None))):
+                raise ValueError(f"Exportación '{nombre}': '{campo}' debe ser un texto.")
+        for campo in ('detalle', 'anomalias'):
+            if not isinstance(exportacion.get(campo, False), bool):
+                raise ValueError(f"Exportación '{nombre}': '{campo}' debe ser true o false.")
+        try:
+            for campo in ('desde', 'hasta'):
+                if exportacion.get(campo):
+                    exportacion[campo] = date.fromisoformat(exportacion[campo])
+            if exportacion.get('fecha'):
+                date.fromisoformat(exportacion['fecha']) # Solo validar el formato AAAA-MM-DD
+        except ValueError as e:
+            raise ValueError(f"Exportación '{nombre}': fecha inválida ({e}); se espera AAAA-MM-DD.")
+    return especificacion
 
 
-def crear_interfaz(backups_por_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo):
+def nombre_archivo_seguro(texto):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(texto))
+
+
+def ejecutar_lote(ruta_especificacion, ruta_resumen=None, ruta_informes=None, ruta_salida=None, procesos=PROCESOS_INGESTA, servicio=None):
+    """
+    Modo por lotes: carga los informes una sola vez y genera todas las exportaciones de la especificación.
+    Con 'servicio' (URL de un ServicioConsultas) los datos se piden al servicio en lugar de leer los informes.
+    Escribe un resumen JSON (en ruta_resumen o en la salida estándar) y devuelve el código de salida.
+    """
+    inicio = datetime.now()
+    resumen = {'inicio': inicio.isoformat(timespec='seconds'), 'especificacion': ruta_especificacion, 'exportaciones': []}
+
+    def terminar(codigo):
+        resumen['codigo_salida'] = codigo
+        resumen['duracion_segundos'] = round((datetime.now() - inicio).total_seconds(), 3)
+        resumen['etapas'] = METRICAS.informe()['etapas']
+        resumen['metricas'] = METRICAS.guardar()
+        texto = json.dumps(resumen, ensure_ascii=False, indent=2, default=str)
+        if ruta_resumen:
+            with open(ruta_resumen, 'w', encoding='utf-8') as f:
+                f.write(texto)
+        else:
+            print(texto)
+        return codigo
+
+    try:
+        especificacion = leer_especificacion(ruta_especificacion)
+    except (OSError, ValueError) as e:
+        logging.error(f"Especificación de lote inválida {ruta_especificacion}: {e}")
+        resumen['error'] = str(e)
+        return terminar(SALIDA_ESPECIFICACION_INVALIDA)
+
+    ruta_informes = ruta_informes or especificacion.get('informes', RUTA_INFORMES)
+    ruta_salida = ruta_salida or especificacion.get('salida', RUTA_EXPORTACION)
+    resumen['informes'] = servicio or ruta_informes
+    # Si alguna exportación pide anomalías, la misma lectura de la carpeta guarda el historial completo
+    historial = RegistroBackups() if not servicio and any(e.get('anomalias') for e in especificacion['exportaciones']) else None
+    try:
+        datos = (ClienteServicio(servicio).cargar(historial=1) if servicio
+                 else analizar_informes(ruta_informes, procesos, historial=historial))
+        registro, _, _, servidores, _, _ = datos
+    except (OSError, ValueError) as e: # Incluye los errores de conexión con el servicio y sus respuestas inválidas
+        logging.error(f"No se pudieron leer los informes de {servicio or ruta_informes}: {e}")
+        resumen['error'] = str(e)
+        return terminar(SALIDA_SIN_DATOS)
+    except Exception as e: # Siempre se escribe el resumen, con un código distinto del de una exportación fallida
+        logging.exception(f"Error inesperado leyendo los informes de {servicio or ruta_informes}")
+        resumen['error'] = f"{type(e).__name__}: {e}"
+        return terminar(SALIDA_ERROR_INESPERADO)
+    resumen['servidores'] = len(servidores)
+    resumen['fallas_reales'] = len(registro)
+    if not servidores:
+        resumen['error'] = "No se encontraron datos válidos en los informes."
+        return terminar(SALIDA_SIN_DATOS)
+
+    os.makedirs(ruta_salida, exist_ok=True)
+    motor_fallas = MotorConsultas(registro)
+    fallas = registro
+    anomalias = None # Se calculan solo si alguna exportación las pide (necesitan el historial completo)
+    sello = inicio.strftime("%Y-%m-%d_%H-%M-%S")
+    hubo_errores = False
+    for exportacion in especificacion['exportaciones']:
+        filtros = [exportacion.get(campo) or ('' if campo not in ('desde', 'hasta') else None) for campo in FILTROS_LOTE]
+        if exportacion.get('anomalias'):
+            if anomalias is None:
+                try:
+                    anomalias = (ClienteServicio(servicio).anomalias() if servicio
+                                 else detectar_anomalias(historial.subconjunto(ejecuciones_unicas(historial))))
+                except Exception as e: # P. ej. sin conexión con el servicio, respuesta inválida o sin numpy
+                    logging.error(f"No se pudieron calcular las anomalías: {e}")
+                    resumen['exportaciones'].append({'nombre': exportacion['nombre'], 'error': f"{type(e).__name__}: {e}"})
+                    hubo_errores = True
+                    continue
+                motor_anomalias = MotorConsultas(anomalias)
+                resumen['anomalias'] = len(anomalias)
+            registro, motor = anomalias, motor_anomalias
+            indices = motor.consultar(*filtros) # Todas las anomalías: cada una tiene su propio detalle
+        else:
+            registro, motor = fallas, motor_fallas
+            indices = motor.consultar(*filtros) if exportacion.get('detalle') else motor.resumen_diario(*filtros)
+
+        # Un archivo por servidor o por trabajo, o uno solo con todo
+        grupos = {None: indices}
+        if exportacion.get('por'):
+            columna, tabla = ((registro.servidor, registro.servidores) if exportacion['por'] == 'servidor'
+                              else (registro.trabajo, registro.trabajos))
+            grupos = defaultdict(list)
+            for i in indices:
+                grupos[tabla.valores[columna[i]]].append(i)
+
+        for grupo, indices_grupo in sorted(grupos.items(), key=lambda g: g[0] or ''):
+            nombre = exportacion['nombre'] if grupo is None else f"{exportacion['nombre']}_{nombre_archivo_seguro(grupo)}"
+            entrada = {'nombre': nombre, 'filtros': {c: exportacion[c] for c in FILTROS_LOTE + ('por', 'detalle', 'anomalias') if exportacion.get(c)},
+                       'formato': exportacion['formato'], 'filas': 0, 'archivo': None}
+            if grupo is not None:
+                entrada['grupo'] = grupo
+            try:
+                if indices_grupo:
+                    ruta_archivo = os.path.join(ruta_salida, f"{nombre}_{sello}.{exportacion['formato']}")
+                    # Los mensajes de los exportadores van a stderr para no mezclarse con el resumen JSON
+                    with redirect_stdout(sys.stderr):
+                        entrada['archivo'], entrada['filas'] = exportar_informe(
+                            (registro[i] for i in indices_grupo), exportacion['formato'], ruta_archivo, agrupar_por_dia=False,
+                            con_detalle=registro is anomalias)
+            except Exception as e:
+                logging.error(f"Error en la exportación '{nombre}': {e}")
+                entrada['error'] = str(e)
+                hubo_errores = True
+            resumen['exportaciones'].append(entrada)
+
+    return terminar(SALIDA_ERRORES_EXPORTACION if hubo_errores else SALIDA_OK)
+
+
+def leer_argumentos(argumentos=None):
+    lector = argparse.ArgumentParser(description="Explorador de Backups: interfaz gráfica o generación de informes por lotes.")
+    lector.add_argument('--lote', metavar='ESPECIFICACION',
+                        help="Ejecuta sin interfaz las exportaciones descritas en este archivo JSON.")
+    lector.add_argument('--resumen', metavar='RUTA', help="Archivo donde escribir el resumen JSON del lote (por defecto, la salida estándar).")
+    lector.add_argument('--informes', metavar='CARPETA', help="Carpeta de informes (sustituye a la de la especificación o a la configurada).")
+    lector.add_argument('--salida', metavar='CARPETA', help="Carpeta de exportación (sustituye a la de la especificación).")
+    lector.add_argument('--procesos', type=int, default=PROCESOS_INGESTA, help="Procesos para leer los informes.")
+    lector.add_argument('--servir', action='store_true',
+                        help="Inicia el servicio de consultas HTTP/JSON local en lugar de la interfaz.")
+    lector.add_argument('--puerto', type=int, default=PUERTO_SERVICIO, help="Puerto del servicio de consultas.")
+    lector.add_argument('--servicio', metavar='URL',
+                        help="Usa los datos de un servicio de consultas (p. ej. http://127.0.0.1:8765) en lugar de leer los informes.")
+    lector.add_argument('--metricas', metavar='RUTA', default=RUTA_METRICAS,
+                        help=f"Archivo JSON con los tiempos por etapa y los contadores por archivo (por defecto, {RUTA_METRICAS}).")
+    lector.add_argument('--perfil', metavar='RUTA', help="Ejecuta bajo cProfile y guarda las estadísticas en este archivo.")
+    return lector.parse_args(argumentos)
+
+
+# --- Interfaz gráfica ---
+def cargar_modulos_interfaz():
+    """
+    Importa Tk, ttkbootstrap y PIL solo cuando se va a abrir la interfaz: el modo por lotes y los procesos
+    de lectura no los necesitan (y en los servidores de informes pueden no estar instalados).
+    """
+    global ttk, Image, ImageTk, ImageDraw, ImageFont, Messagebox, INFO, PRIMARY, SUCCESS, SECONDARY
+    import ttkbootstrap as ttk
+    from ttkbootstrap.constants import INFO, PRIMARY, SUCCESS, SECONDARY
+    from ttkbootstrap.dialogs import Messagebox
+    from PIL import Image, ImageTk, ImageDraw, ImageFont
+
+
+# Tabla de resultados de la interfaz
+# Columnas de la tabla: (identificador, título, ancho en píxeles)
+COLUMNAS_RESULTADO = [
+    ('inicio', "Inicio", 150), ('fin', "Fin", 150), ('servidor', "Servidor", 220),
+    ('trabajo', "Trabajo", 260), ('estado', "Estado", 90), ('tamano', "Tamaño Backup (GB)", 130),
+    ('detalle', "Detalle", 420), # Solo en la vista de anomalías
+]
+
+
+def formatear_fila_resultado(registro, indice):
+    intento = registro[indice]
+    tamano = intento['tamano_backup']
+    return (intento['inicio'].strftime(CONFIGURACION_FECHA_HORA), intento['fin'].strftime(CONFIGURACION_FECHA_HORA),
+            intento['servidor'], intento['nombre_trabajo'], intento['estado'], "" if tamano is None else f"{tamano:.2f}",
+            intento.get('detalle', ""))
+
+
+def clave_orden_resultado(registro, columna):
+    """Función clave para ordenar índices del registro por una columna de la tabla, sin crear vistas."""
+    if columna in ('inicio', 'fin'):
+        return getattr(registro, columna).__getitem__
+    if columna == 'tamano':
+        return lambda i: -1.0 if isnan(registro.tamano_backup[i]) else registro.tamano_backup[i]
+    if columna == 'detalle':
+        return lambda i: registro.valor(i, 'detalle') if isinstance(registro, RegistroAnomalias) else ""
+    tabla, codigos = {'servidor': (registro.servidores, registro.servidor),
+                      'trabajo': (registro.trabajos, registro.trabajo),
+                      'estado': (registro.estados, registro.estado)}[columna]
+    return lambda i: tabla.valores[codigos[i]]
+
+
+class TablaVirtual:
+    """
+    Tabla de resultados que solo crea las filas visibles.
+    El Treeview tiene tantas filas como caben en pantalla y la barra de desplazamiento mueve una ventana
+    sobre la lista de índices, así que mostrar un millón de resultados cuesta lo mismo que mostrar cien.
+    Al pulsar un encabezado se llama a al_ordenar(columna); 'orden' guarda (columna, descendente).
+    """
+
+    def __init__(self, padre, columnas, formatear_fila, al_ordenar=None):
+        self.formatear_fila = formatear_fila
+        self.origen = None
+        self.indices = []
+        self.primera = 0
+        self.visibles = 25
+        self.orden = None
+
+        self.marco = ttk.Frame(padre)
+        self.arbol = ttk.Treeview(self.marco, columns=[c[0] for c in columnas], show="headings",
+                                  height=self.visibles, selectmode="browse")
+        for columna, titulo, ancho in columnas:
+            self.arbol.heading(columna, text=titulo, command=(lambda c=columna: al_ordenar(c)) if al_ordenar else "")
+            self.arbol.column(columna, width=ancho, stretch=True)
+        self.barra = ttk.Scrollbar(self.marco, orient="vertical", command=self.desplazar)
+        self.arbol.pack(side="left", fill="both", expand=True)
+        self.barra.pack(side="right", fill="y")
+
+        self.arbol.bind("<Configure>", self.ajustar_alto)
+        self.arbol.bind("<MouseWheel>", lambda e: self.desplazar("scroll", -3 if e.delta > 0 else 3, "units")) # Windows
+        self.arbol.bind("<Button-4>", lambda e: self.desplazar("scroll", -3, "units")) # Linux
+        self.arbol.bind("<Button-5>", lambda e: self.desplazar("scroll", 3, "units"))
+
+    def pack(self, **opciones):
+        self.marco.pack(**opciones)
+
+    def mostrar(self, origen, indices):
+        self.origen = origen
+        self.indices = indices
+        self.primera = 0
+        self.refrescar()
+
+    def ajustar_alto(self, event):
+        alto_fila = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visibles = max(1, event.height // alto_fila - 1) # Se descuenta la fila de encabezados
+        if visibles != self.visibles:
+            self.visibles = visibles
+            self.refrescar()
+
+    def desplazar(self, accion, cantidad, unidad=None):
+        total = len(self.indices)
+        if accion == "moveto":
+            self.primera = int(float(cantidad) * total)
+        elif accion == "scroll":
+            self.primera += int(cantidad) * (self.visibles if unidad == "pages" else 1)
+        self.primera = max(0, min(self.primera, total - self.visibles))
+        self.refrescar()
+
+    def refrescar(self):
+        self.arbol.delete(*self.arbol.get_children())
+        ventana = self.indices[self.primera:self.primera + self.visibles]
+        for indice in ventana:
+            self.arbol.insert("", "end", values=self.formatear_fila(self.origen, indice))
+        total = len(self.indices)
+        if total:
+            self.barra.set(self.primera / total, (self.primera + len(ventana)) / total)
+        else:
+            self.barra.set(0, 1)
+
+
+def crear_interfaz(cargar_datos, vigilante=None, cargar_anomalias=None):
+    """
+    Abre la ventana de inmediato y ejecuta cargar_datos() (que devuelve lo mismo que analizar_informes)
+    en un hilo aparte mientras se muestra el progreso. Las búsquedas, ordenaciones y exportaciones
+    también se resuelven fuera del hilo de Tk.
+    Con cargar_anomalias() (que devuelve un RegistroAnomalias) las anomalías de duración y tamaño se
+    calculan en su propio hilo solo al abrir su vista, y de nuevo si los datos cambian mientras está abierta.
+    """
+    cargar_modulos_interfaz()
+
+    # Sin datos hasta que termine la carga en segundo plano
+    backups_por_servidor = RegistroBackups()
+    trabajos_por_servidor, fechas_por_servidor_y_trabajo = defaultdict(set), defaultdict(set)
+    trabajos, servidores, fechas = [], [], []
+    # Índices de consulta sobre las fallas reales, construidos una sola vez para todas las búsquedas
+    motor = MotorConsultas(backups_por_servidor)
+    # Anomalías de tendencia del historial completo, con su propio motor de consultas
+    anomalias = RegistroAnomalias()
+    motor_anomalias = MotorConsultas(anomalias)
+
     app = ttk.Window(themename="superhero")
     app.title("Explorador de Backups")
     app.geometry("1300x750")
@@ -240,6 +2760,10 @@ def crear_interfaz(backups_por_servidor, trabajos_por_servidor, trabajos, servid
     label_titulo = ttk.Label(frame_top, text="Explorador de Backups", font=("Segoe UI", 18, "bold"))
     label_titulo.pack(side="left")
 
+    # Estado de la vigilancia de la carpeta de informes
+    label_actualizacion = ttk.Label(frame_top, text="", bootstyle=SECONDARY)
+    label_actualizacion.pack(side="right", padx=10)
+
     # --- Frame de filtros ---
     frame_filtros = ttk.LabelFrame(app, text="Filtros de Búsqueda", padding=15)
     frame_filtros.pack(padx=10, pady=5, fill="x")
@@ -263,8 +2787,14 @@ def crear_interfaz(backups_por_servidor, trabajos_por_servidor, trabajos, servid
 
     # Botones
     ttk.Button(frame_filtros, text="Limpiar Filtros", command=lambda: limpiar_filtros(), bootstyle=INFO).grid(row=2, column=1, pady=10)
-    ttk.Button(frame_filtros, text="Buscar", command=lambda: buscar(), bootstyle=PRIMARY).grid(row=2, column=3, pady=10)
-    ttk.Button(frame_filtros, text="Exportar a Excel", command=lambda: exportar(), bootstyle=SUCCESS).grid(row=2, column=4, pady=10)
+    boton_buscar = ttk.Button(frame_filtros, text="Buscar", command=lambda: buscar(), bootstyle=PRIMARY, state="disabled")
+    boton_buscar.grid(row=2, column=3, pady=10)
+    boton_exportar = ttk.Button(frame_filtros, text="Exportar", command=lambda: exportar(), bootstyle=SUCCESS, state="disabled")
+    boton_exportar.grid(row=2, column=4, pady=10)
+    combo_formato = ttk.Combobox(frame_filtros, values=list(FORMATOS_EXPORTACION), state="readonly", width=8)
+    combo_formato.set("xlsx")
+    combo_formato.grid(row=2, column=5, padx=5)
+    ttk.Button(frame_filtros, text="Cancelar", command=lambda: cancelar(), bootstyle="warning-outline").grid(row=2, column=6, pady=10)
 
     # Logo SAVIA con créditos, mini y más a la derecha
     try:
@@ -291,9 +2821,23 @@ def crear_interfaz(backups_por_servidor, trabajos_por_servidor, trabajos, servid
     except Exception as e:
         print(f"ATENCIÓN: No se pudo cargar el logo SAVIA: {e}")
 
-    # Área de resultados
-    text_resultado = ttk.ScrolledText(app, width=150, height=30, wrap="none", font=("Consolas", 10))
-    text_resultado.pack(padx=10, pady=10, fill="both", expand=True)
+    # Barra de estado con el progreso de la carga y de las búsquedas
+    frame_estado = ttk.Frame(app)
+    frame_estado.pack(padx=10, fill="x")
+    barra_progreso = ttk.Progressbar(frame_estado, mode="indeterminate", length=200, bootstyle=INFO)
+    barra_progreso.pack(side="left")
+    label_estado = ttk.Label(frame_estado, text="Cargando informes...")
+    label_estado.pack(side="left", padx=10)
+
+    # Vista de resultados: todos los intentos, el resumen diario (última falla de cada día) o las anomalías
+    vista = ttk.StringVar(value="intentos")
+    ttk.Radiobutton(frame_estado, text="Anomalías", variable=vista, value="anomalias", command=lambda: mostrar_vista()).pack(side="right", padx=10)
+    ttk.Radiobutton(frame_estado, text="Resumen diario", variable=vista, value="resumen", command=lambda: mostrar_vista()).pack(side="right")
+    ttk.Radiobutton(frame_estado, text="Todos los intentos", variable=vista, value="intentos", command=lambda: mostrar_vista()).pack(side="right", padx=10)
+
+    # Área de resultados: tabla virtual, solo se crean las filas visibles
+    tabla_resultado = TablaVirtual(app, COLUMNAS_RESULTADO, formatear_fila_resultado, al_ordenar=lambda columna: ordenar(columna))
+    tabla_resultado.pack(padx=10, pady=10, fill="both", expand=True)
 
     # --- Funciones auxiliares para la UI (actualizan los ComboBoxes) ---
     def actualizar_combobox_trabajos(event=None):
@@ -344,121 +2888,344 @@ def crear_interfaz(backups_por_servidor, trabajos_por_servidor, trabajos, servid
     actualizar_combobox_fechas()
 
 
+    def refrescar_combos():
+        # Igual que al inicio, pero conservando la selección del usuario si sigue siendo válida
+        seleccion_srv, seleccion_job, seleccion_fecha = combo_servidor.get(), combo_trabajo.get(), combo_fecha.get()
+        combo_servidor['values'] = [""] + sorted(list(servidores))
+        combo_servidor.set(seleccion_srv if seleccion_srv in servidores else "")
+        actualizar_combobox_trabajos()
+        if seleccion_job in combo_trabajo['values']:
+            combo_trabajo.set(seleccion_job)
+        actualizar_combobox_fechas()
+        if seleccion_fecha in combo_fecha['values']:
+            combo_fecha.set(seleccion_fecha)
+
+    # --- Tareas en segundo plano ---
+    # Un solo hilo de trabajo resuelve búsquedas, ordenaciones y exportaciones; los resultados vuelven por
+    # una cola que el hilo de Tk revisa con app.after. Cada búsqueda recibe un número: al lanzar otra (o al
+    # cancelar) la anterior se descarta aunque termine, y si aún no había empezado ni siquiera se ejecuta.
+    ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="busquedas")
+    cola_resultados = queue.Queue()
+    tarea_actual = {'numero': 0, 'futuro': None}
+    resultados = {'registro': backups_por_servidor, 'intentos': [], 'resumen': [], 'registro_anomalias': anomalias, 'anomalias': [],
+                  'filtros': None}
+    # Las tendencias van en otro hilo para no demorar las búsquedas; solo cuenta el último cálculo lanzado.
+    # 'pendiente' marca que los datos cambiaron desde el último cálculo (se recalcula al pedir la vista)
+    ejecutor_tendencias = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tendencias")
+    cola_tendencias = queue.Queue()
+    tendencias = {'numero': 0, 'activas': bool(cargar_anomalias) and ANALIZAR_TENDENCIAS, 'pendiente': False}
+
+    def lanzar(tarea, al_terminar, mensaje, cancelable=True):
+        numero = None
+        if cancelable:
+            cancelar(silencioso=True)
+            numero = tarea_actual['numero']
+
+        def ejecutar():
+            try:
+                cola_resultados.put((numero, al_terminar, tarea(), None))
+            except Exception as e:
+                cola_resultados.put((numero, al_terminar, None, e))
+
+        futuro = ejecutor.submit(ejecutar)
+        if cancelable:
+            tarea_actual['futuro'] = futuro
+        label_estado.config(text=mensaje)
+        barra_progreso.start(10)
+
+    def cancelar(silencioso=False):
+        tarea_actual['numero'] += 1
+        if tarea_actual['futuro'] is not None:
+            tarea_actual['futuro'].cancel()
+            tarea_actual['futuro'] = None
+        if not silencioso:
+            barra_progreso.stop()
+            label_estado.config(text="Búsqueda cancelada.")
+
+    def atender_cola():
+        try:
+            while True:
+                numero, al_terminar, resultado, error = cola_resultados.get_nowait()
+                if numero is not None and numero != tarea_actual['numero']:
+                    continue # Tarea cancelada o reemplazada por otra más reciente
+                barra_progreso.stop()
+                if error is not None:
+                    logging.error(f"Error en tarea de la interfaz: {error}")
+                    label_estado.config(text=f"Error: {error}")
+                else:
+                    al_terminar(resultado)
+        except queue.Empty:
+            pass
+        atender_tendencias()
+        app.after(100, atender_cola)
+
+    # --- Anomalías de tendencia (segundo plano) ---
+    def calcular_tendencias():
+        if not tendencias['activas'] or not tendencias['pendiente']:
+            return
+        tendencias['pendiente'] = False
+        tendencias['numero'] += 1
+        numero = tendencias['numero']
+
+        def ejecutar():
+            try:
+                nuevas = cargar_anomalias()
+                cola_tendencias.put((numero, (nuevas, MotorConsultas(nuevas)), None))
+            except Exception as e:
+                cola_tendencias.put((numero, None, e))
+
+        ejecutor_tendencias.submit(ejecutar)
+
+    def datos_cambiados():
+        tendencias['pendiente'] = True
+        if vista.get() == 'anomalias':
+            calcular_tendencias()
+
+    def atender_tendencias():
+        nonlocal anomalias, motor_anomalias
+        try:
+            while True:
+                numero, resultado, error = cola_tendencias.get_nowait()
+                if numero != tendencias['numero']:
+                    continue # Ya se lanzó un cálculo con datos más recientes
+                if isinstance(error, RuntimeError): # Falta numpy: se sigue sin la vista de anomalías
+                    logging.warning(f"Análisis de tendencias desactivado: {error}")
+                    tendencias['activas'] = False
+                    label_actualizacion.config(text="Tendencias no disponibles (falta numpy).")
+                elif error is not None:
+                    logging.error(f"Error calculando las anomalías de tendencia: {error}")
+                    tendencias['pendiente'] = True # Se reintenta la próxima vez que se pida la vista
+                else:
+                    anomalias, motor_anomalias = resultado
+                    label_actualizacion.config(text=f"{len(anomalias)} anomalías de duración/tamaño.")
+                    # Se aplican los filtros de la última búsqueda (las anomalías son pocas)
+                    resultados['registro_anomalias'] = anomalias
+                    resultados['anomalias'] = (motor_anomalias.consultar(*resultados['filtros'])
+                                               if resultados['filtros'] is not None else [])
+                    if vista.get() == 'anomalias':
+                        tabla_resultado.orden = None
+                        mostrar_vista()
+        except queue.Empty:
+            pass
+
+    # --- Carga inicial y actualizaciones de la vigilancia ---
+    # Últimos (fallas, motor) aplicados o ya cargados. Las tareas lo leen al ejecutarse (de a una, en el hilo de
+    # trabajo), no al lanzarse, así ven los meses que cargó una búsqueda anterior aunque esta se haya descartado
+    vigentes = {'actual': (backups_por_servidor, motor)}
+
+    def aplicar_datos(datos, nuevo_motor):
+        nonlocal backups_por_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo, motor
+        backups_por_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo = datos
+        motor = nuevo_motor
+        vigentes['actual'] = (backups_por_servidor, motor)
+        refrescar_combos()
+
+    def aplicar_si_vigente(actualizacion):
+        datos, nuevo_motor = actualizacion
+        if nuevo_motor is not motor and vigilante.es_vigente(datos): # Pudo llegar antes por otra vía o quedar atrás
+            aplicar_datos(datos, nuevo_motor)
+
+    def datos_para(filtros):
+        """
+        (fallas, motor) con los que resolver los filtros, desde el hilo de trabajo. Si la fecha pedida está en
+        meses del histórico que aún no están en memoria, se cargan antes; los datos nuevos se dejan en la cola
+        como tarea sin número, así se aplican aunque la búsqueda o exportación se cancele o se reemplace.
+        """
+        registro, motor_actual = vigentes['actual']
+        dia = date.fromisoformat(filtros[2]) if filtros[2] else None
+        nuevos_datos = vigilante.asegurar_periodo(dia, dia) if vigilante else None
+        if nuevos_datos is not None:
+            registro, motor_actual = nuevos_datos[0], MotorConsultas(nuevos_datos[0])
+            vigentes['actual'] = (registro, motor_actual)
+            cola_resultados.put((None, aplicar_si_vigente, (nuevos_datos, motor_actual), None))
+        return registro, motor_actual
+
+    def cargar():
+        datos = cargar_datos()
+        return datos, MotorConsultas(datos[0])
+
+    def carga_terminada(resultado):
+        aplicar_datos(*resultado)
+        boton_buscar.config(state="normal")
+        boton_exportar.config(state="normal")
+        if not servidores:
+            print("ADVERTENCIA: No se encontraron datos válidos en los informes. Asegúrate de que los archivos existan y contengan los encabezados correctos.")
+            label_estado.config(text="No se encontraron datos válidos en los informes.")
+        else:
+            label_estado.config(text=f"Datos cargados: {len(backups_por_servidor)} fallas reales en {len(servidores)} servidores.")
+        datos_cambiados()
+        if vigilante:
+            label_actualizacion.config(text="Vigilando nuevos informes...")
+            vigilante.iniciar()
+            app.after(1000, revisar_actualizaciones)
+
+    def revisar_actualizaciones():
+        # Recoge (en el hilo de Tk) los datos que el vigilante preparó en segundo plano
+        actualizado = False
+        try:
+            while True:
+                datos, nuevo_motor = vigilante.actualizaciones.get_nowait()
+                if vigilante.es_vigente(datos): # Una búsqueda pudo haber cargado después datos más completos
+                    aplicar_datos(datos, nuevo_motor)
+                    actualizado = True
+        except queue.Empty:
+            pass
+        if actualizado:
+            label_actualizacion.config(text=f"Datos actualizados: {datetime.now().strftime('%H:%M:%S')}")
+            datos_cambiados()
+        app.after(1000, revisar_actualizaciones)
+
+    app.after(100, atender_cola)
+    lanzar(cargar, carga_terminada, "Cargando informes...", cancelable=False)
+
+
     def limpiar_filtros():
         combo_servidor.set("")
         combo_trabajo.set("")
         combo_fecha.set("")
         combo_estado.set("")
-        text_resultado.delete(1.0, ttk.END)
+        cancelar(silencioso=True)
+        barra_progreso.stop()
+        label_estado.config(text="")
+        resultados.update(intentos=[], resumen=[], anomalias=[], filtros=None)
+        tabla_resultado.mostrar(backups_por_servidor, [])
         # Re-actualizar comboboxes para mostrar todas las opciones
         actualizar_combobox_trabajos()
         actualizar_combobox_fechas()
 
 
-    def buscar():
-        text_resultado.delete(1.0, ttk.END)
-        filtro_srv = combo_servidor.get().strip()
-        filtro_job = combo_trabajo.get().strip()
-        filtro_fecha = combo_fecha.get().strip()
-        filtro_estado = combo_estado.get().strip()
-
-        resultados_filtrados = []
-        resumen_diario_fallas = {}
-
-        # Iterar sobre los backups_por_servidor que ya están pre-filtrados por fallas reales
-        for servidor, historial in backups_por_servidor.items():
-            if filtro_srv and filtro_srv != servidor:
-                continue
-            
-            for intento in historial:
-                # La lógica de 'estado == success' ya se manejó en filtrar_fallos_reales
-                # Aquí solo aplicamos los filtros seleccionados en la UI
-                if filtro_job and filtro_job != intento['nombre_trabajo']:
-                    continue
-                if filtro_fecha and filtro_fecha != intento['inicio'].strftime('%Y-%m-%d'):
-                    continue
-                # Se eliminó el 'continue' incorrecto que estaba aquí, permitiendo que la verificación de estado ocurra.
-                if filtro_estado and filtro_estado != intento['estado']:
-                    continue
+    def filtros_actuales():
+        return (combo_servidor.get().strip(), combo_trabajo.get().strip(),
+                combo_fecha.get().strip(), combo_estado.get().strip())
 
-                resultados_filtrados.append({**intento, 'servidor': servidor})
+    def registro_vista(nombre_vista):
+        return resultados['registro_anomalias'] if nombre_vista == 'anomalias' else resultados['registro']
 
-                clave_diaria = (servidor, intento['nombre_trabajo'], intento['inicio'].date())
-                # Solo se actualiza el resumen si el intento actual es más reciente para esa clave diaria
-                if clave_diaria not in resumen_diario_fallas or intento['inicio'] > resumen_diario_fallas[clave_diaria]['inicio']:
-                    resumen_diario_fallas[clave_diaria] = {**intento, 'servidor': servidor}
+    def mostrar_vista():
+        if vista.get() == 'anomalias':
+            calcular_tendencias() # Solo si los datos cambiaron desde el último cálculo
+        # La columna "Detalle" solo tiene contenido en la vista de anomalías
+        columnas = [c[0] for c in COLUMNAS_RESULTADO if vista.get() == 'anomalias' or c[0] != 'detalle']
+        tabla_resultado.arbol.configure(displaycolumns=columnas)
+        tabla_resultado.mostrar(registro_vista(vista.get()), resultados[vista.get()])
 
+    def buscar():
+        filtros = filtros_actuales()
+        registro_anomalias, motor_tendencias = anomalias, motor_anomalias
+
+        def tarea():
+            # Si la búsqueda pide meses del histórico que aún no están en memoria, se cargan antes
+            registro_busqueda, motor_actual = datos_para(filtros)
+            # Las fallas reales ya están pre-filtradas; el motor resuelve los filtros de la UI con sus índices
+            return (registro_busqueda, motor_actual.consultar(*filtros), motor_actual.resumen_diario(*filtros),
+                    registro_anomalias, motor_tendencias.consultar(*filtros))
+
+        def terminada(resultado):
+            (resultados['registro'], resultados['intentos'], resultados['resumen'],
+             resultados['registro_anomalias'], resultados['anomalias']) = resultado
+            resultados['filtros'] = filtros
+            if resultados['registro_anomalias'] is not anomalias: # Llegaron anomalías nuevas durante la búsqueda
+                resultados['registro_anomalias'], resultados['anomalias'] = anomalias, motor_anomalias.consultar(*filtros)
+            tabla_resultado.orden = None
+            mostrar_vista()
+            texto_anomalias = f", {len(resultados['anomalias'])} anomalías" if resultados['anomalias'] else ""
+            if resultados['intentos']:
+                label_estado.config(text=f"{len(resultados['intentos'])} intentos fallidos, {len(resultados['resumen'])} fallas diarias (servidor, trabajo, día){texto_anomalias}.")
+            else:
+                label_estado.config(text=f"No se encontraron fallas con los filtros dados{texto_anomalias}.")
 
-        if resultados_filtrados:
-            resultados_filtrados.sort(key=lambda x: (x['servidor'], x['nombre_trabajo'], x['inicio']))
+        lanzar(tarea, terminada, "Buscando...")
 
-            text_resultado.insert(ttk.END, "Todos los intentos (filtrados por falla):\n")
-            for r in resultados_filtrados:
-                text_resultado.insert(ttk.END, f"{r['inicio'].strftime('%Y-%m-%d %H:%M:%S')} | {r['servidor']} | {r['nombre_trabajo']} | Estado: {r['estado']}\n")
+    def ordenar(columna):
+        registro, indices = registro_vista(vista.get()), resultados[vista.get()]
+        if not indices:
+            return
+        descendente = tabla_resultado.orden == (columna, False)
+        nombre_vista = vista.get()
 
-            text_resultado.insert(ttk.END, "\n--- Resumen de Fallas Diarias (por Servidor y Trabajo) ---\n")
-            fallas_para_mostrar = sorted(resumen_diario_fallas.values(), key=lambda x: (x['servidor'], x['nombre_trabajo'], x['inicio'].date()))
+        def tarea():
+            return sorted(indices, key=clave_orden_resultado(registro, columna), reverse=descendente)
 
-            if fallas_para_mostrar:
-                for r in fallas_para_mostrar:
-                    text_resultado.insert(ttk.END, f" {r['inicio'].strftime('%Y-%m-%d')} | Servidor: {r['servidor']} | Trabajo: {r['nombre_trabajo']} | Estado: {r['estado']}\n")
-            else:
-                text_resultado.insert(ttk.END, "No hay fallas únicas por día que cumplan los filtros.\n")
+        def terminada(ordenados):
+            resultados[nombre_vista] = ordenados
+            tabla_resultado.orden = (columna, descendente)
+            mostrar_vista()
+            label_estado.config(text=f"Ordenado por {columna}{' (descendente)' if descendente else ''}.")
 
-        else:
-            text_resultado.insert(ttk.END, "No se encontraron fallas con los filtros dados.\n")
+        lanzar(tarea, terminada, "Ordenando...")
 
 
     def exportar():
-        filtro_srv = combo_servidor.get().strip()
-        filtro_job = combo_trabajo.get().strip()
-        filtro_fecha = combo_fecha.get().strip()
-        filtro_estado = combo_estado.get().strip()
-
-        resultados_para_exportar = []
-        # Volvemos a filtrar los 'backups_por_servidor' ya pre-filtrados por fallas
-        for servidor, historial in backups_por_servidor.items():
-            if filtro_srv and filtro_srv != servidor:
-                continue
-            for intento in historial:
-                # Ya sabemos que son fallas, solo aplicamos los filtros de la UI
-                if filtro_job and filtro_job != intento['nombre_trabajo']:
-                    continue
-                if filtro_fecha and filtro_fecha != intento['inicio'].strftime('%Y-%m-%d'):
-                    continue
-                if filtro_estado and filtro_estado != intento['estado']:
-                    continue
-                resultados_para_exportar.append({**intento, 'servidor': servidor})
-
-        if resultados_para_exportar:
-            # Exportar solo las fallas únicas por día para el informe
-            fallas_distinct_para_exportar = {}
-            for r in resultados_para_exportar:
-                clave_diaria = (r['servidor'], r['nombre_trabajo'], r['inicio'].date())
-                if clave_diaria not in fallas_distinct_para_exportar or r['inicio'] > fallas_distinct_para_exportar[clave_diaria]['inicio']:
-                    fallas_distinct_para_exportar[clave_diaria] = r
-            
-            exportar_excel(list(fallas_distinct_para_exportar.values()))
-        else:
-            ttk.messagebox.showinfo("Exportar", "No hay fallas para exportar con los filtros dados.")
+        filtros = filtros_actuales()
+        formato = combo_formato.get() or 'xlsx'
+        con_detalle = vista.get() == 'anomalias'
+        registro_anomalias, motor_tendencias = anomalias, motor_anomalias
+        que = "anomalías" if con_detalle else "fallas"
+
+        def tarea():
+            # Exportar solo las fallas únicas por día: el resumen del motor ya viene agrupado (y se reutiliza si
+            # ya se buscó con estos filtros), y las filas se pasan al exportador sin construir una lista intermedia.
+            # En la vista de anomalías se exportan todas, cada una con su detalle. Como en buscar(), antes se
+            # cargan del histórico los meses de la fecha pedida que falten.
+            registro, motor_exportacion = (registro_anomalias, motor_tendencias) if con_detalle else datos_para(filtros)
+            indices = motor_exportacion.consultar(*filtros) if con_detalle else motor_exportacion.resumen_diario(*filtros)
+            if not indices:
+                return None
+            resultado = exportar_informe((registro[i] for i in indices), formato, agrupar_por_dia=False, con_detalle=con_detalle)
+            METRICAS.guardar() # Con el tiempo de esta exportación
+            return resultado
+
+        def terminada(resultado):
+            if resultado:
+                ruta_archivo, cantidad = resultado
+                label_estado.config(text=f"Exportadas {cantidad} {que} a {ruta_archivo}.")
+            else:
+                label_estado.config(text="")
+                Messagebox.show_info(f"No hay {que} para exportar con los filtros dados.", title="Exportar")
+
+        lanzar(tarea, terminada, "Exportando...", cancelable=False)
 
     app.mainloop()
+    ejecutor.shutdown(wait=False, cancel_futures=True)
+    ejecutor_tendencias.shutdown(wait=False, cancel_futures=True)
+    if vigilante:
+        vigilante.detener()
 
 
 # --- MAIN ---
 if __name__ == "__main__":
-    try:
-        print("Cargando datos...")
-        # Llama a analizar_informes al inicio para cargar todos los datos
-        backups_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo = analizar_informes(RUTA_INFORMES)
-        
-        # Si no se cargan servidores, significa que no se encontraron datos válidos
-        if not servidores:
-            print("ADVERTENCIA: No se encontraron datos válidos en los informes. Asegúrate de que los archivos existan y contengan los encabezados correctos.")
-            # Puedes añadir un mensaje emergente aquí si lo deseas:
-            # ttk.messagebox.showwarning("Advertencia", "No se encontraron datos válidos en los informes. Asegúrate de que los archivos existan y contengan los encabezados correctos.")
+    multiprocessing.freeze_support() # Necesario para el pool de procesos dentro del ejecutable de PyInstaller
+    argumentos = leer_argumentos()
+    METRICAS.ruta = argumentos.metricas
+    if argumentos.lote:
+        # Modo por lotes: sin Tk ni ttkbootstrap, pensado para tareas programadas
+        with perfilar(argumentos.perfil):
+            codigo = ejecutar_lote(argumentos.lote, argumentos.resumen, argumentos.informes, argumentos.salida,
+                                   argumentos.procesos, argumentos.servicio)
+        sys.exit(codigo)
+
+    if argumentos.servir:
+        # Servicio compartido: una sola carga de los informes para todos los analistas
+        servicio = ServicioConsultas(argumentos.informes or RUTA_INFORMES, argumentos.procesos)
+        try:
+            with perfilar(argumentos.perfil):
+                asyncio.run(servicio.servir(puerto=argumentos.puerto))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
 
-        crear_interfaz(backups_servidor, trabajos_por_servidor, trabajos, servidores, fechas, fechas_por_servidor_y_trabajo)
+    try:
+        # La ventana se abre de inmediato y los datos se cargan en segundo plano; con la vigilancia activa,
+        # el vigilante conserva el estado para ir incorporando los informes que lleguen.
+        # Con --servicio, los datos (y sus actualizaciones) llegan del servicio de consultas compartido
+        ruta_informes = argumentos.informes or RUTA_INFORMES
+        if argumentos.servicio:
+            vigilante = ClienteServicio(argumentos.servicio)
+        else:
+            vigilante = VigilanteInformes(ruta_informes, argumentos.procesos) if VIGILAR_INFORMES else None
+        with perfilar(argumentos.perfil):
+            crear_interfaz(vigilante.cargar if vigilante else lambda: analizar_informes(ruta_informes, argumentos.procesos), vigilante,
+                           vigilante.anomalias if vigilante else lambda: detectar_anomalias(historial_completo(ruta_informes, argumentos.procesos)))
     except Exception as e:
         logging.error(f"Error general en la aplicación: {e}")
         print(f"ERROR: Fallo en la aplicación: {e}")
@@ -0,0 +1,288 @@
+"""
+Banco de pruebas de rendimiento de analisis_backups.
+
+Genera informes sintéticos parecidos a los de Veeam (con variantes de encabezados, filas de título
+antes de los encabezados, distintos formatos de fecha y mezclas de estados), en XLSX, CSV o comprimidos
+(--formato), y mide por separado:
+la lectura de informes (analizar_informes), la clasificación de fallas (filtrar_fallos_reales), el
+filtrado de búsqueda/exportación (MotorConsultas) y la exportación a Excel (exportar_excel).
+De cada etapa guarda tiempo y filas por segundo (y con --memoria, el pico de memoria medido en una
+segunda ejecución), y compara con una base guardada para detectar regresiones.
+
+Uso:
+    python benchmark_backups.py --escenario mediano
+    python benchmark_backups.py --escenario mediano --guardar-base
+    python benchmark_backups.py --vms 500 --dias 60 --informes 10
+    python benchmark_backups.py --escenario mediano --formato csv.gz
+    python benchmark_backups.py --escenario mediano --mezcla inestable
+"""
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import csv
+import gzip
+import zipfile
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+from time import perf_counter
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import openpyxl
+
+import analisis_backups as ab
+
+# Escenarios predefinidos: VMs, días de historial, informes (cada informe cubre un tramo de días)
+ESCENARIOS = {
+    'pequeno': {'vms': 10, 'dias': 7, 'informes': 2},
+    'mediano': {'vms': 1000, 'dias': 30, 'informes': 10},
+    'grande': {'vms': 10000, 'dias': 90, 'informes': 30},
+    'enorme': {'vms': 100000, 'dias': 365, 'informes': 120},
+}
+TRABAJOS_POR_VM = 2
+# Proporciones de estados por informe. Con 'variable' cada informe usa una según su variante, así la
+# clasificación ve tanto informes casi sin fallas como informes con muchos reintentos
+MEZCLAS_ESTADOS = {
+    'normal': [('Success', 0.8), ('Failed', 0.12), ('Warning', 0.08)],
+    'estable': [('Success', 0.97), ('Failed', 0.02), ('Warning', 0.01)],
+    'inestable': [('Success', 0.5), ('Failed', 0.35), ('Warning', 0.15)],
+}
+MEZCLA_VARIABLE = 'variable'
+FORMATOS_FECHA_SINTETICOS = [None, '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p'] # None = datetime nativo
+TOLERANCIA_REGRESION = 0.20 # Una etapa es regresión si tarda un 20% más que en la base
+MINIMO_REGRESION = 0.05 # ...y al menos 50 ms más, para no marcar ruido en etapas muy cortas
+RUTA_BASE = "benchmark_base.json"
+FORMATOS_INFORME = ('xlsx', 'csv', 'csv.gz', 'zip') # 'zip' = un CSV dentro de un .zip por informe
+
+
+def generar_filas(vms, desde, dias, variante, semilla, mezcla=MEZCLA_VARIABLE):
+    """
+    Filas de un informe sintético: primero las de título y los encabezados, después los datos.
+    'variante' elige los aliases de los encabezados, las filas de título previas, el formato de fecha y,
+    con mezcla 'variable', la proporción de estados; si no, 'mezcla' es una clave de MEZCLAS_ESTADOS.
+    """
+    aleatorio = random.Random(semilla)
+    formato_fecha = FORMATOS_FECHA_SINTETICOS[variante % len(FORMATOS_FECHA_SINTETICOS)]
+    encabezados = [aliases[variante % len(aliases)].title() for aliases in ab.ENCABEZADOS_POSIBLES.values()]
+    if mezcla == MEZCLA_VARIABLE:
+        mezcla = list(MEZCLAS_ESTADOS)[variante % len(MEZCLAS_ESTADOS)]
+    estados, pesos = zip(*MEZCLAS_ESTADOS[mezcla])
+
+    for n in range(variante % 4): # 0 a 3 filas de título antes de los encabezados
+        yield [f"Informe de trabajos de backup ({n + 1})"]
+    yield encabezados
+
+    for dia in range(dias):
+        for vm in range(vms):
+            for trabajo in range(TRABAJOS_POR_VM):
+                inicio = desde + timedelta(days=dia, hours=trabajo * 6, minutes=aleatorio.randrange(0, 300))
+                duracion = timedelta(minutes=aleatorio.randrange(5, 180))
+                fin = inicio + duracion
+                if formato_fecha:
+                    inicio, fin = inicio.strftime(formato_fecha), fin.strftime(formato_fecha)
+                yield [f"VM{vm:06d}", f"Backup Job {trabajo}", inicio, fin, str(duracion),
+                       round(aleatorio.uniform(1, 500), 2), round(aleatorio.uniform(1, 200), 2),
+                       aleatorio.choices(estados, pesos)[0]]
+
+
+def generar_informe(ruta, vms, desde, dias, variante, semilla, formato='xlsx', mezcla=MEZCLA_VARIABLE):
+    """Escribe un informe sintético en el formato indicado (XLSX en modo de solo escritura). Devuelve sus filas de datos."""
+    filas = generar_filas(vms, desde, dias, variante, semilla, mezcla)
+    if formato == 'xlsx':
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Job History")
+        for fila in filas:
+            ws.append(fila)
+        wb.save(ruta)
+    elif formato == 'zip':
+        with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as paquete, \
+                paquete.open(os.path.basename(ruta)[:-len('.zip')] + '.csv', 'w') as binario, \
+                io.TextIOWrapper(binario, encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(filas)
+    else:
+        with (gzip.open(ruta, 'wt', encoding='utf-8', newline='') if formato == 'csv.gz'
+              else open(ruta, 'w', encoding='utf-8', newline='')) as f:
+            csv.writer(f).writerows(filas)
+    return vms * dias * TRABAJOS_POR_VM
+
+
+def generar_conjunto(carpeta, vms, dias, informes, semilla=1, formato='xlsx', mezcla=MEZCLA_VARIABLE):
+    """Reparte 'dias' de historial entre 'informes' archivos. Devuelve el total de filas generadas."""
+    os.makedirs(carpeta, exist_ok=True)
+    desde = datetime(2025, 1, 1)
+    dias_por_informe = max(1, dias // informes)
+    filas = 0
+    for n in range(informes):
+        filas += generar_informe(os.path.join(carpeta, f"informe_{n:04d}.{formato}"), vms,
+                                 desde + timedelta(days=n * dias_por_informe), dias_por_informe, n, semilla + n, formato, mezcla)
+    return filas
+
+
+def medir(funcion, *args, memoria=False):
+    """Ejecuta la función y devuelve (resultado, segundos, pico de memoria en MB o None).
+
+    El tiempo se toma sin trazar memoria: tracemalloc hace cada asignación varias veces más lenta.
+    Con memoria=True la función se ejecuta otra vez bajo tracemalloc solo para obtener el pico.
+    """
+    inicio = perf_counter()
+    resultado = funcion(*args)
+    segundos = perf_counter() - inicio
+    return resultado, segundos, pico_memoria(funcion, *args) if memoria else None
+
+
+def pico_memoria(funcion, *args):
+    """Pico de memoria en MB de una ejecución de la función, según tracemalloc."""
+    tracemalloc.start()
+    try:
+        funcion(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def consultas_representativas(motor, registro, cantidad, semilla=1):
+    """Combinaciones de filtros como las de la interfaz: servidor, trabajo, fecha y estado."""
+    aleatorio = random.Random(semilla)
+    servidores, trabajos = registro.servidores.valores, registro.trabajos.valores
+    fechas = sorted({intento['inicio'].strftime('%Y-%m-%d') for intento in (registro[i] for i in range(0, len(registro), 97))})
+    resultados = 0
+    for _ in range(cantidad):
+        filtros = (aleatorio.choice([''] + servidores) if servidores else '',
+                   aleatorio.choice(['', ''] + trabajos) if trabajos else '',
+                   aleatorio.choice(['', ''] + fechas) if fechas else '',
+                   aleatorio.choice(['', 'failed', 'warning']))
+        resultados += len(motor.consultar(*filtros)) + len(motor.resumen_diario(*filtros))
+    return resultados
+
+
+def ejecutar(carpeta, procesos, consultas, carpeta_exportacion, memoria=False):
+    """Mide cada etapa sobre la carpeta de informes y devuelve las métricas."""
+    metricas = {}
+    ab.METRICAS.ruta = None # El desglose por etapa se incluye en las métricas del banco, no en un archivo aparte
+
+    def cargar():
+        # El desglose se toma enseguida: la ejecución para medir memoria lo reemplazaría
+        return ab.analizar_informes(carpeta, procesos, None), ab.METRICAS.informe()['etapas']
+
+    (datos, etapas), segundos, pico = medir(cargar, memoria=memoria)
+    archivos = ab.listar_informes(carpeta)
+
+    # Historial completo (no medido) para cronometrar la clasificación de fallas por separado
+    historial = ab.RegistroBackups()
+    for _, serializado in ab.leer_archivos(archivos, procesos):
+        historial.extender(ab.RegistroBackups.deserializar(serializado))
+    metricas['analizar_informes'] = {'segundos': segundos, 'pico_mb': pico, 'filas': len(historial),
+                                     'fallas': len(datos[0]), 'etapas': etapas}
+
+    fallas, segundos, pico = medir(ab.filtrar_fallos_reales, historial, memoria=memoria)
+    metricas['filtrar_fallos_reales'] = {'segundos': segundos, 'pico_mb': pico, 'filas': len(historial)}
+
+    motor, segundos, pico = medir(ab.MotorConsultas, fallas, memoria=memoria)
+    metricas['indices_consulta'] = {'segundos': segundos, 'pico_mb': pico, 'filas': len(fallas)}
+
+    def filtrar():
+        motor.cache.clear() # Cada ejecución parte sin resultados guardados
+        return consultas_representativas(motor, fallas, consultas)
+
+    _, segundos, pico = medir(filtrar, memoria=memoria)
+    metricas['filtrado_busqueda'] = {'segundos': segundos, 'pico_mb': pico, 'filas': consultas}
+
+    indices = motor.resumen_diario()
+    ruta = os.path.join(carpeta_exportacion, "benchmark.xlsx")
+    with redirect_stdout(sys.stderr):
+        _, segundos, pico = medir(lambda: ab.exportar_excel((fallas[i] for i in indices), ruta, False), memoria=memoria)
+    metricas['exportar_excel'] = {'segundos': segundos, 'pico_mb': pico, 'filas': len(indices)}
+
+    for etapa in metricas.values():
+        etapa['filas_por_segundo'] = etapa['filas'] / etapa['segundos'] if etapa['segundos'] else 0.0
+    return metricas
+
+
+def comparar(metricas, base, tolerancia=TOLERANCIA_REGRESION):
+    """Devuelve la lista de etapas cuyo tiempo empeoró más que la tolerancia respecto a la base."""
+    regresiones = []
+    for etapa, valores in metricas.items():
+        anterior = base.get(etapa)
+        if not anterior or not anterior.get('segundos'):
+            continue
+        variacion = valores['segundos'] / anterior['segundos'] - 1
+        valores['variacion_vs_base'] = variacion
+        if variacion > tolerancia and valores['segundos'] - anterior['segundos'] > MINIMO_REGRESION:
+            regresiones.append(etapa)
+    return regresiones
+
+
+def leer_argumentos(argumentos=None):
+    lector = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de analisis_backups.")
+    lector.add_argument('--escenario', choices=sorted(ESCENARIOS), default='pequeno')
+    lector.add_argument('--vms', type=int, help="Sustituye las VMs del escenario.")
+    lector.add_argument('--dias', type=int, help="Sustituye los días de historial del escenario.")
+    lector.add_argument('--informes', type=int, help="Sustituye la cantidad de informes del escenario.")
+    lector.add_argument('--formato', choices=FORMATOS_INFORME, default='xlsx', help="Formato de los informes sintéticos.")
+    lector.add_argument('--mezcla', choices=[MEZCLA_VARIABLE, *MEZCLAS_ESTADOS], default=MEZCLA_VARIABLE,
+                        help="Proporción de estados (éxitos/fallas/advertencias); 'variable' la cambia según el informe.")
+    lector.add_argument('--procesos', type=int, default=1,
+                        help="Procesos de lectura (1 por defecto, para que --memoria vea toda la memoria).")
+    lector.add_argument('--memoria', action='store_true',
+                        help="Mide también el pico de memoria de cada etapa, en una segunda ejecución con tracemalloc.")
+    lector.add_argument('--consultas', type=int, default=200, help="Consultas de filtrado a cronometrar.")
+    lector.add_argument('--carpeta', help="Reutiliza (o crea) esta carpeta de informes en lugar de una temporal.")
+    lector.add_argument('--base', default=RUTA_BASE, help="Archivo JSON con la base de comparación.")
+    lector.add_argument('--guardar-base', action='store_true', help="Guarda estas métricas como nueva base.")
+    return lector.parse_args(argumentos)
+
+
+def main(argumentos=None):
+    argumentos = leer_argumentos(argumentos)
+    escenario = dict(ESCENARIOS[argumentos.escenario])
+    for clave in ('vms', 'dias', 'informes'):
+        if getattr(argumentos, clave):
+            escenario[clave] = getattr(argumentos, clave)
+    nombre = f"{argumentos.escenario}:{escenario['vms']}x{escenario['dias']}x{escenario['informes']}"
+    if argumentos.formato != 'xlsx': # Cada formato tiene su propia base
+        nombre += f":{argumentos.formato}"
+    if argumentos.mezcla != MEZCLA_VARIABLE: # ...y cada mezcla de estados fija también
+        nombre += f":{argumentos.mezcla}"
+
+    temporal = tempfile.mkdtemp(prefix="benchmark_backups_")
+    try:
+        carpeta = argumentos.carpeta or os.path.join(temporal, "informes")
+        if not (os.path.isdir(carpeta) and os.listdir(carpeta)):
+            print(f"Generando informes sintéticos ({nombre})...", file=sys.stderr)
+            generar_conjunto(carpeta, formato=argumentos.formato, mezcla=argumentos.mezcla, **escenario)
+        metricas = ejecutar(carpeta, argumentos.procesos, argumentos.consultas, temporal, argumentos.memoria)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    bases = {}
+    if os.path.exists(argumentos.base):
+        with open(argumentos.base, encoding='utf-8') as f:
+            bases = json.load(f)
+    regresiones = comparar(metricas, bases.get(nombre, {}))
+
+    for etapa, valores in metricas.items():
+        variacion = valores.get('variacion_vs_base')
+        texto_variacion = f" ({variacion:+.0%} vs base)" if variacion is not None else ""
+        texto_memoria = f" {valores['pico_mb']:9.1f} MB" if valores['pico_mb'] is not None else ""
+        print(f"{etapa:24s} {valores['segundos']:9.3f} s {valores['filas_por_segundo']:12.0f} filas/s"
+              f"{texto_memoria}{texto_variacion}")
+
+    if argumentos.guardar_base:
+        bases[nombre] = metricas
+        with open(argumentos.base, 'w', encoding='utf-8') as f:
+            json.dump(bases, f, indent=2)
+        print(f"Base guardada en {argumentos.base} para {nombre}.", file=sys.stderr)
+    if regresiones:
+        print(f"REGRESIÓN en: {', '.join(regresiones)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())